@@ -0,0 +1,177 @@
+import contextlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+from strike_store import open_database
+
+ACK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_acks (
+    segment INTEGER PRIMARY KEY,
+    strikes INTEGER NOT NULL
+);
+"""
+
+
+# Token bucket limiting the backfill upload rate to `rate` bytes per second with bursts of up to
+# `capacity` bytes. A payload larger than the capacity is let through once the bucket is full.
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, amount, now=None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < min(amount, self.capacity):
+            return False
+        self.tokens -= amount
+        return True
+
+
+# Function to check whether the live MQTT queues are empty, from MultiBrokerPublisher.stats():
+# at least one broker connected, and no normal, priority or bulk messages waiting on any connected one.
+def live_queue_idle(stats):
+    connected = [link for link in stats if link["connected"]]
+    return bool(connected) and all(link["queued"] == 0 and link["bulk_queued"] == 0 for link in connected)
+
+
+# Function to build the compressed payload of one segment: zlib-compressed JSON with the rowid
+# range and the strikes as [ts, distance, uncorrected distance, bearing].
+def encode_segment(segment, first, last, rows):
+    record = {"segment": segment, "first": first, "last": last, "count": len(rows),
+              "strikes": [[round(ts, 3), distance, uncorrected, bearing] for ts, distance, uncorrected, bearing in rows]}
+    return zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"), 6)
+
+
+# Function to decode a payload built by encode_segment (used by the central side and the tests).
+def decode_segment(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+# Backfill of the local strike store to the central aggregator. Strikes are grouped into segments
+# of segment_size consecutive rowids. The aggregator acknowledges a segment by publishing
+# {"segment": n, "count": strikes received} on "<backfill topic>/ack"; acknowledgements are kept
+# in the store, so a segment is uploaded again only if it has grown since, or if no ack arrived
+# within ack_timeout seconds. Uploads are bulk messages, made only while the live MQTT queues are
+# empty and within the token bucket, so live strikes are always sent first. The newest segment is
+# only uploaded once it is full or has had no new strike for `settle` seconds.
+class BackfillService:
+    def __init__(self, db_path, client, topic, rate=2000.0, segment_size=1000, settle=300.0,
+                 ack_timeout=120.0, poll_interval=1.0):
+        self.db_path = db_path
+        self.client = client
+        self.topic = topic
+        self.ack_topic = f"{topic}/ack"
+        self.segment_size = segment_size
+        self.settle = settle
+        self.ack_timeout = ack_timeout
+        self.poll_interval = poll_interval
+        self.bucket = TokenBucket(rate, max(rate * 5, 16384))
+        self.acks = queue.SimpleQueue()
+        self.acked = {}
+        self.pending = {}  # Segment -> monotonic time of the last upload.
+        self.next_upload = None  # (segment, payload) waiting for the live queue or the token bucket.
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="backfill", daemon=True)
+
+    def start(self):
+        self.connection = open_database(self.db_path)
+        self.connection.executescript(ACK_SCHEMA)
+        self.acked = dict(self.connection.execute("SELECT segment, strikes FROM backfill_acks"))
+        self.client.subscribe(self.ack_topic, self._on_ack, qos=1)
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.connection.close()
+
+    # Function to count the segments with strikes the aggregator has not acknowledged. Uses its own
+    # connection, as the service's connection belongs to the backfill thread.
+    def missing_segments(self):
+        with contextlib.closing(sqlite3.connect(self.db_path)) as connection:
+            last_rowid = connection.execute("SELECT MAX(rowid) FROM strikes").fetchone()[0] or 0
+        return sum(1 for segment in range((last_rowid + self.segment_size - 1) // self.segment_size)
+                   if self.acked.get(segment, 0) < self._expected(segment, last_rowid))
+
+    def _on_ack(self, topic, payload):
+        self.acks.put(payload)  # Handled on the backfill thread, which owns the database connection.
+
+    def _expected(self, segment, last_rowid):
+        return min(self.segment_size, last_rowid - segment * self.segment_size)
+
+    def _apply_acks(self):
+        while True:
+            try:
+                payload = self.acks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ack = json.loads(payload)
+                segment, count = int(ack["segment"]), int(ack["count"])
+            except (ValueError, KeyError, TypeError):
+                print(f"Ignoring malformed backfill ack: {payload[:100]!r}")
+                continue
+            if count > self.acked.get(segment, 0):
+                self.acked[segment] = count
+                with self.connection:
+                    self.connection.execute("INSERT OR REPLACE INTO backfill_acks VALUES (?, ?)", (segment, count))
+            self.pending.pop(segment, None)
+
+    # Function to find the oldest segment that needs uploading, or None.
+    def _next_segment(self, now):
+        last_rowid = self.connection.execute("SELECT MAX(rowid) FROM strikes").fetchone()[0] or 0
+        for segment in range((last_rowid + self.segment_size - 1) // self.segment_size):
+            expected = self._expected(segment, last_rowid)
+            if self.acked.get(segment, 0) >= expected:
+                continue
+            if now - self.pending.get(segment, -self.ack_timeout) < self.ack_timeout:
+                continue
+            if expected < self.segment_size:
+                newest = self.connection.execute("SELECT MAX(ts) FROM strikes WHERE rowid > ?",
+                                                 (segment * self.segment_size,)).fetchone()[0]
+                if time.time() - newest < self.settle:
+                    return None
+            return segment
+        return None
+
+    def _run(self):
+        while self.running:
+            self._apply_acks()
+            if not self._upload():
+                time.sleep(self.poll_interval)
+
+    # Function to upload the next missing segment if the uplink is idle. Returns True if one was sent.
+    def _upload(self):
+        if not live_queue_idle(self.client.stats()):
+            return False
+        now = time.monotonic()
+        if self.next_upload is None:
+            segment = self._next_segment(now)
+            if segment is None:
+                return False
+            first = segment * self.segment_size + 1
+            last = first + self.segment_size - 1
+            rows = self.connection.execute(
+                "SELECT ts, distance, uncorrected_distance, bearing FROM strikes WHERE rowid BETWEEN ? AND ? "
+                "ORDER BY rowid", (first, last)).fetchall()
+            self.next_upload = (segment, encode_segment(segment, first, last, rows))
+        segment, payload = self.next_upload
+        if not self.bucket.consume(len(payload), now):
+            return False  # Keep the payload until the bucket has refilled.
+        self.client.publish(self.topic, payload, qos=1, bulk=True)
+        self.pending[segment] = now
+        self.uploaded += 1
+        self.uploaded_bytes += len(payload)
+        self.next_upload = None
+        return True
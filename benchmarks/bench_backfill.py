@@ -0,0 +1,121 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backfill import BackfillService, decode_segment
+from mqtt_publisher import MultiBrokerPublisher
+from mqtt_standin import BrokerStandIn
+from strike_store import StrikeStore
+
+
+# Central aggregator stand-in: records live latency and backfilled strikes, and acknowledges segments.
+class Central:
+    def __init__(self, port):
+        self.lock = threading.Lock()
+        self.live_latency = []  # (sent at, latency in seconds)
+        self.strikes = set()
+        self.backfill_bytes = []  # (received at, payload size)
+        self.client = MultiBrokerPublisher([("127.0.0.1", port)], "bench-central")
+        self.client.subscribe("bench/live", self.on_live, qos=1)
+        self.client.subscribe("bench/backfill", self.on_backfill, qos=1)
+        self.client.loop_start()
+
+    def on_live(self, topic, payload):
+        sent_at = float(payload)
+        with self.lock:
+            self.live_latency.append((sent_at, time.time() - sent_at))
+
+    def on_backfill(self, topic, payload):
+        record = decode_segment(payload)
+        with self.lock:
+            self.backfill_bytes.append((time.time(), len(payload)))
+            self.strikes.update(strike[0] for strike in record["strikes"])
+        self.client.publish("bench/backfill/ack", json.dumps({"segment": record["segment"], "count": record["count"]}),
+                            qos=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill after a broker outage, against a local broker stand-in.")
+    parser.add_argument("--archived", type=int, default=20000, help="Strikes already in the store at startup")
+    parser.add_argument("--live-rate", type=float, default=50.0, help="Live strikes per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of live strikes")
+    parser.add_argument("--rate", type=float, default=50000.0, help="Backfill bandwidth cap in bytes per second")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "strikes.db")
+    rng = random.Random(1)
+    store = StrikeStore(db_path, flush_interval=0.1)
+    start = time.time() - 86400
+    for i in range(args.archived):
+        store.add(round(start + i * 0.5, 3), rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 360))
+
+    broker = BrokerStandIn().start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        central = Central(broker.port)
+        station = MultiBrokerPublisher([("127.0.0.1", broker.port)], "bench-station", queue_size=100000)
+        station.loop_start()
+        backfill = BackfillService(db_path, station, "bench/backfill", rate=args.rate, segment_size=500, settle=2.0,
+                                   ack_timeout=10.0, poll_interval=0.1)
+        time.sleep(1.0)
+        backfill.start()
+
+        # Live strikes, with the broker stopped from 30% to 60% of the run.
+        outage = (args.duration * 0.3, args.duration * 0.6)
+        began = time.monotonic()
+        events = [(outage[0], broker.stop), (outage[1], broker.start)]
+        outage_times = []
+        count = int(args.duration * args.live_rate)
+        for i in range(count):
+            while events and time.monotonic() - began >= events[0][0]:
+                events.pop(0)[1]()
+                outage_times.append(time.time())
+            delay = began + i / args.live_rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.time()
+            store.add(round(now, 3), rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 360))
+            station.publish("bench/live", repr(now), qos=1)
+
+        # Wait for the backfill to catch up (the last segment settles two seconds after the last strike).
+        deadline = time.monotonic() + 300
+        while (backfill.missing_segments() or backfill.next_upload) and time.monotonic() < deadline:
+            time.sleep(0.5)
+        caught_up = time.monotonic() - began - args.duration
+        backfill.stop()
+        station.loop_stop()
+        central.client.loop_stop()
+        store.close()
+    broker.stop()
+
+    with contextlib.closing(sqlite3.connect(db_path)) as connection:
+        stored = {round(ts, 3) for (ts,) in connection.execute("SELECT ts FROM strikes")}
+    outside = [latency * 1000 for sent_at, latency in central.live_latency
+               if not outage_times[0] - 1.0 <= sent_at <= outage_times[1] + 2.0]
+    quantiles = statistics.quantiles(outside, n=100)
+    sizes = central.backfill_bytes
+    span = sizes[-1][0] - sizes[0][0] if len(sizes) > 1 else 1.0
+
+    print(f"Live: {len(central.live_latency)} of {count} delivered; latency outside the outage "
+          f"p50 {quantiles[49]:.1f} ms, p99 {quantiles[98]:.1f} ms, max {max(outside):.1f} ms")
+    print(f"Backfill: {backfill.uploaded} uploads, {backfill.uploaded_bytes:,} bytes compressed, "
+          f"{sum(size for _, size in sizes) / span:,.0f} bytes/s received (cap {args.rate:,.0f}), "
+          f"caught up {caught_up:.1f} s after the last live strike")
+    print(f"Central has {len(central.strikes & stored)} of {len(stored)} stored strikes, "
+          f"{backfill.missing_segments()} segments unacknowledged")
+    assert central.strikes >= stored, "Backfill missed strikes"
+    assert backfill.missing_segments() == 0
+
+
+if __name__ == "__main__":
+    main()
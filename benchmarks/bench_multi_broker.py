@@ -0,0 +1,90 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mqtt_publisher import MultiBrokerPublisher
+from mqtt_standin import BrokerStandIn
+
+
+# Function to publish `count` numbered messages at `rate` per second, running `events`
+# (seconds offset -> callable) along the way. Returns the worst publish() call time in ms.
+def publish_run(publisher, count, rate, events):
+    events = sorted(events.items())
+    worst = 0.0
+    start = time.monotonic()
+    for i in range(count):
+        while events and time.monotonic() - start >= events[0][0]:
+            events.pop(0)[1]()
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        begin = time.perf_counter()
+        publisher.publish("bench/strikes", str(i).encode(), qos=1)
+        worst = max(worst, (time.perf_counter() - begin) * 1000)
+    time.sleep(3.0)  # Let the queues drain.
+    return worst
+
+
+def unique(broker):
+    return {int(payload) for payload in broker.messages("bench/strikes")}
+
+
+# Fan-out: broker A is stopped and restarted mid-run, broker C acknowledges slowly. Broker B
+# must get every message, and publish() must never stall on A or C.
+def run_fanout(count, rate):
+    a, b, c = BrokerStandIn().start(), BrokerStandIn().start(), BrokerStandIn(ack_delay=0.05).start()
+    publisher = MultiBrokerPublisher([("127.0.0.1", a.port), ("127.0.0.1", b.port), ("127.0.0.1", c.port)],
+                                     "bench-fanout", mode="fanout", queue_size=count)
+    publisher.loop_start()
+    time.sleep(1.0)
+    duration = count / rate
+    worst = publish_run(publisher, count, rate, {duration * 0.3: a.stop, duration * 0.6: a.start})
+    print(f"Fan-out: worst publish() {worst:.2f} ms; received A (stopped 30%-60%) {len(unique(a))}, "
+          f"B {len(unique(b))}, C (50 ms acks) {len(unique(c))} of {count}")
+    for stats in publisher.stats():
+        print(f"  {stats}")
+    publisher.loop_stop()
+    for broker in (a, b, c):
+        broker.stop()
+    assert len(unique(b)) == count, "Healthy broker B missed messages"
+
+
+# Failover: primary A is stopped mid-run and restarted; messages must move to standby B and back.
+def run_failover(count, rate):
+    a, b = BrokerStandIn().start(), BrokerStandIn().start()
+    publisher = MultiBrokerPublisher([("127.0.0.1", a.port), ("127.0.0.1", b.port)],
+                                     "bench-failover", mode="failover", queue_size=count)
+    publisher.loop_start()
+    time.sleep(1.0)
+    duration = count / rate
+    worst = publish_run(publisher, count, rate, {duration * 0.3: a.stop, duration * 0.6: a.start})
+    delivered = unique(a) | unique(b)
+    print(f"Failover: worst publish() {worst:.2f} ms; primary A {len(unique(a))}, standby B {len(unique(b))}, "
+          f"delivered {len(delivered)} of {count}, active at end {publisher.active.name}")
+    failed_back = publisher.active.port == a.port
+    publisher.loop_stop()
+    for broker in (a, b):
+        broker.stop()
+    assert len(delivered) == count, "Messages were lost during failover"
+    assert failed_back, "Did not fail back to the primary broker"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-broker publisher failure scenarios with local broker stand-ins.")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per scenario")
+    parser.add_argument("--rate", type=int, default=200, help="Messages per second")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        run_fanout(args.messages, args.rate)
+        run_failover(args.messages, args.rate)
+    print("\n".join(line for line in log.getvalue().splitlines() if line.startswith(("Fan-out", "Failover", "  {"))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import concurrent.futures
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nmea_convert import convert_file, pyarrow
+from nmea_parser import build_sentence, parse_gprmc, parse_wimli
+
+
+# Function to build one hour of a stormy station log: 1 Hz GPS sentences, status and noise
+# sentences and `strikes_per_second` strikes on average.
+def storm_hour(start, strikes_per_second, rng):
+    lines = []
+    for second in range(3600):
+        moment = start + datetime.timedelta(seconds=second)
+        lines.append(build_sentence("GPRMC", moment.strftime("%H%M%S.00"), "A", "5130.44399", "N", "00007.66800", "W",
+                                    "0.021", "", moment.strftime("%d%m%y"), "", "", "A"))
+        lines.append(build_sentence("GPGGA", moment.strftime("%H%M%S.00"), "5130.44399", "N", "00007.66800", "W",
+                                    "1", "09", "0.93", "50.0", "M", "45.4", "M", "", ""))
+        lines.append(build_sentence("WIMST", 0, 3, 0, 0, 0.0))
+        lines.append("$WIMLN*AB")
+        for _ in range(rng.randint(0, 2 * strikes_per_second)):
+            lines.append(build_sentence("WIMLI", rng.randint(0, 300), rng.randint(0, 300), round(rng.uniform(0, 360), 1)))
+    return ("\n".join(lines) + "\n").encode("ascii")
+
+
+# Function to write a synthetic corpus of `files` logs totalling about `size` bytes.
+def write_corpus(directory, size, files, strikes_per_second):
+    rng = random.Random(1)
+    block = storm_hour(datetime.datetime(2026, 7, 1), strikes_per_second, rng)
+    paths = []
+    for index in range(files):
+        path = os.path.join(directory, "rpi1", f"nmea_{index:03d}.txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            for _ in range(max(1, size // files // len(block))):
+                file.write(block)
+        paths.append(path)
+    return paths
+
+
+# Function to parse a log line by line with the existing parsers, as the ad-hoc scripts did.
+def line_by_line(path, limit):
+    strikes = 0
+    with open(path, "r") as file:
+        for index, line in enumerate(file):
+            if index >= limit:
+                break
+            parse_gprmc(line)
+            if parse_wimli(line) is not None:
+                strikes += 1
+    return strikes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NMEA log to columnar conversion throughput.")
+    parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the synthetic corpus in GB")
+    parser.add_argument("--files", type=int, default=8, help="Number of log files")
+    parser.add_argument("--strikes-per-second", type=int, default=20, help="Average strike rate of the synthetic storm")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--format", default="parquet" if pyarrow is not None else "npz", help="Output format")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_corpus(directory, int(args.size_gb * 1e9), args.files, args.strikes_per_second)
+        total = sum(os.path.getsize(path) for path in paths)
+        print(f"Corpus: {len(paths)} files, {total / 1e9:.2f} GB")
+
+        start = time.perf_counter()
+        line_by_line(paths[0], 1000000)
+        sample = time.perf_counter() - start
+        with open(paths[0], "rb") as file:
+            sample_bytes = sum(len(line) for _, line in zip(range(1000000), file))
+        print(f"Line-by-line parsing: {sample_bytes / 1e9 / sample * 60:.2f} GB/min (one process, first 1M lines)")
+
+        output = os.path.join(directory, "dataset")
+        start = time.perf_counter()
+        strikes = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for _, stats in pool.map(convert_file, paths, [output] * len(paths), [args.format] * len(paths)):
+                strikes += stats["strikes"]
+        elapsed = time.perf_counter() - start
+        print(f"Converter ({args.format}, {args.jobs} processes): {total / 1e9 / elapsed * 60:.2f} GB/min, "
+              f"{strikes:,} strikes in {elapsed:.1f} s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
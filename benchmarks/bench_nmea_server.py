@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nmea_parser import build_sentence
+from nmea_server import NmeaServer
+
+LINES = [build_sentence("WIMLI", 12, 14, 270.5), build_sentence("WIMST", 0, 3, 0, 0, 0.0)]
+MESSAGE_SIZE = len(("\r\n".join(LINES) + "\r\n").encode("ascii"))
+
+
+# Client process: opens `clients` reading connections plus one stalled connection that never
+# reads, then reports when every reading client has received all expected bytes.
+def client_process(port, clients, expected_bytes, ready, results):
+    async def reader_client(done_times):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        received = 0
+        while received < expected_bytes:
+            data = await reader.read(65536)
+            if not data:
+                break
+            received += len(data)
+        done_times.append(time.time())
+        writer.close()
+
+    async def run():
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect(("127.0.0.1", port))
+        done_times = []
+        tasks = [asyncio.ensure_future(reader_client(done_times)) for _ in range(clients)]
+        await asyncio.sleep(1.0)  # Let every connection be accepted.
+        ready.set()
+        await asyncio.gather(*tasks)
+        stalled.close()
+        results.put(done_times)
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NMEA TCP server fan-out benchmark.")
+    parser.add_argument("--clients", type=int, default=100, help="Number of reading TCP clients")
+    parser.add_argument("--messages", type=int, default=50000, help="Messages sent to every client (enough to stall the stalled client)")
+    args = parser.parse_args()
+
+    server = NmeaServer(host="127.0.0.1", tcp_port=0, max_client_buffer=65536)
+    server.start()
+
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Event(), context.Queue()
+    child = context.Process(target=client_process,
+                            args=(server.tcp_port, args.clients, args.messages * MESSAGE_SIZE, ready, results))
+    child.start()
+    ready.wait()
+    print(f"{len(server.clients)} clients connected ({args.clients} reading, 1 stalled)")
+
+    send_costs = []
+    start_wall = time.time()
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        server.send(LINES)
+        send_costs.append((time.perf_counter() - start) * 1e6)
+    done_times = results.get()
+    child.join()
+    elapsed = max(done_times) - start_wall
+
+    delivered = args.messages * args.clients
+    print(f"send() cost on the caller: median {statistics.median(send_costs):.1f} us, max {max(send_costs):.1f} us")
+    print(f"Fan-out: {delivered:,} messages to {args.clients} clients in {elapsed:.2f} s "
+          f"({delivered / elapsed:,.0f} messages/s, {delivered * MESSAGE_SIZE / elapsed / 1e6:.1f} MB/s)")
+    print(f"Slow clients disconnected: {server.slow_disconnects}")
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
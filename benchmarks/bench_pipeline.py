@@ -0,0 +1,141 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nmea_parser import build_sentence
+from proximity_alerts import strikes_from_text
+from shm_ring import SharedRingBuffer
+
+SOURCE_LD = 1
+CHUNK = (build_sentence("WIMLI", 12, 14, 270.5) + "\r\n").encode("ascii").ljust(64, b"\x00")
+
+
+# Simulated USB reader: one 64-byte chunk every `period` seconds. Records how late each read
+# was serviced, which is what makes the real reader miss USB deadlines.
+def simulated_reader(sink, period, count):
+    lateness = []
+    start = time.perf_counter()
+    for i in range(count):
+        target = start + i * period
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(time.perf_counter() - target)
+        sink(SOURCE_LD, time.time(), CHUNK)
+    return lateness
+
+
+# Processing done for every chunk: the same conversion and parsing as main.py, plus `work_us` of
+# pure-Python work standing in for clustering, statistics and publishing.
+def process_chunk(payload, work_us):
+    text = "".join([chr(x) for x in payload if x != 0])
+    strikes_from_text(text)
+    deadline = time.perf_counter() + work_us / 1e6
+    while time.perf_counter() < deadline:
+        pass
+
+
+def summarize(name, lateness, latencies, elapsed, count):
+    lateness = sorted(x * 1000 for x in lateness)
+    latencies = sorted(x * 1000 for x in latencies)
+    print(f"{name}: {count / elapsed:,.0f} chunks/s processed, "
+          f"end-to-end median {statistics.median(latencies):.2f} ms p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, "
+          f"reader lateness median {statistics.median(lateness):.3f} ms p99 {lateness[int(len(lateness) * 0.99)]:.3f} ms "
+          f"max {lateness[-1]:.2f} ms")
+
+
+def run_single(period, count, work_us):
+    chunks = queue.Queue()
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(lateness=simulated_reader(
+        lambda source, captured_at, payload: chunks.put((captured_at, payload)), period, count)))
+    start = time.perf_counter()
+    reader.start()
+    latencies = []
+    for _ in range(count):
+        captured_at, payload = chunks.get()
+        process_chunk(payload, work_us)
+        latencies.append(time.time() - captured_at)
+    elapsed = time.perf_counter() - start
+    reader.join()
+    summarize("Single process ", result["lateness"], latencies, elapsed, count)
+
+
+def capture_child(ring_name, period, count, results):
+    ring = SharedRingBuffer(ring_name)
+    results.put(simulated_reader(ring.write, period, count))
+    ring.close()
+
+
+def run_multiprocess(period, count, work_us):
+    ring = SharedRingBuffer(f"ld350_bench_{os.getpid()}", 1 << 20, create=True)
+    results = multiprocessing.get_context("spawn").Queue()
+    child = multiprocessing.get_context("spawn").Process(target=capture_child, args=(ring.name, period, count, results))
+    child.start()
+    start = None  # Timed from the first chunk so the child start-up is not counted.
+    latencies = []
+    while len(latencies) < count - ring.dropped:
+        chunk = ring.read(timeout=1.0)
+        if chunk is None:
+            continue
+        start = start or time.perf_counter()
+        _, captured_at, payload = chunk
+        process_chunk(payload, work_us)
+        latencies.append(time.time() - captured_at)
+    elapsed = time.perf_counter() - start
+    lateness = results.get()
+    child.join()
+    if ring.dropped:
+        print(f"Ring buffer dropped {ring.dropped} chunks")
+    ring.close()
+    summarize("Multiprocess   ", lateness, latencies, elapsed, count)
+
+
+def ring_child(ring_name, count):
+    ring = SharedRingBuffer(ring_name)
+    written = 0
+    while written < count:
+        if ring.write(SOURCE_LD, time.time(), CHUNK):
+            written += 1
+    ring.close()
+
+
+# Raw ring throughput between two processes with no processing on either side.
+def run_ring_throughput(count):
+    ring = SharedRingBuffer(f"ld350_bench_raw_{os.getpid()}", 1 << 20, create=True)
+    child = multiprocessing.get_context("spawn").Process(target=ring_child, args=(ring.name, count))
+    start = time.perf_counter()
+    child.start()
+    received = 0
+    while received < count:
+        if ring.read(timeout=1.0, poll_interval=0) is not None:
+            received += 1
+    elapsed = time.perf_counter() - start
+    child.join()
+    ring.close()
+    print(f"Ring throughput: {count / elapsed:,.0f} chunks/s ({count * len(CHUNK) / elapsed / 1e6:.1f} MB/s of USB data)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-process vs shared-memory multiprocess pipeline benchmark.")
+    parser.add_argument("--rate", type=int, default=1000, help="USB chunks per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    parser.add_argument("--work-us", type=float, default=600.0, help="Processing cost per chunk in microseconds")
+    args = parser.parse_args()
+
+    count = int(args.rate * args.seconds)
+    print(f"{args.rate} chunks/s for {args.seconds} s, {args.work_us:.0f} us of processing per chunk")
+    run_single(1.0 / args.rate, count, args.work_us)
+    run_multiprocess(1.0 / args.rate, count, args.work_us)
+    run_ring_throughput(200000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mqtt_publisher import MultiBrokerPublisher
+from mqtt_standin import BrokerStandIn
+from nmea_parser import build_sentence, parse_wimli
+from profiler import Profiler
+
+CHUNK = ("\r\n".join([build_sentence("WIMLI", 12, 14, 270.5), "$WIMLN*AB", build_sentence("WIMST", 0, 3, 0, 0, 0.0)])
+         + "\r\n").encode("ascii")
+
+
+# Stand-in for the main loop: the same stages and laps, with CPU work in place of the USB reads.
+def pipeline(profiler, iterations, sink):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        profiler.begin()
+        data = bytes(CHUNK)
+        profiler.lap("usb_read")
+        text = "".join([chr(x) for x in data])
+        profiler.lap("convert")
+        lines = [line.strip() for line in text.split("\n") if line.startswith("$") and not line.startswith("$WIMLN*AB")]
+        profiler.lap("filter")
+        strikes = [strike for strike in map(parse_wimli, lines) if strike is not None]
+        profiler.lap("analyse")
+        sink.write("\n".join(lines))
+        profiler.lap("write")
+        sink.seek(0)
+        profiler.lap("publish")
+    return (time.perf_counter() - start) / iterations * 1e6, strikes
+
+
+# Keep-alive style thread, so the sampled stacks have more than the main thread in them.
+def idle_thread(stop):
+    while not stop.is_set():
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiler overhead when off and on, and control-topic toggling.")
+    parser.add_argument("--iterations", type=int, default=200000, help="Pipeline iterations per run")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    stop = threading.Event()
+    threading.Thread(target=idle_thread, args=(stop,), name="keep-alive-ld", daemon=True).start()
+    sink = io.StringIO()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler = Profiler(output_dir=output_dir)
+        pipeline(profiler, args.iterations // 10, sink)  # Warm up.
+        off, _ = pipeline(profiler, args.iterations, sink)
+        profiler.start()
+        on, _ = pipeline(profiler, args.iterations, sink)
+        profiler.stop(wait=True)
+    print(f"Pipeline iteration: {off:.2f} us with the profiler off, {on:.2f} us on ({(on - off) / off:+.1%})")
+
+    lap_calls = 1000000
+    start = time.perf_counter()
+    for _ in range(lap_calls):
+        profiler.lap("usb_read")
+    print(f"lap() when off: {(time.perf_counter() - start) / lap_calls * 1e9:.0f} ns")
+
+    folded = [name for name in os.listdir(output_dir) if name.endswith(".folded")]
+    with open(os.path.join(output_dir, folded[0])) as file:
+        threads = {line.split(";", 1)[0] for line in file}
+    with open(os.path.join(output_dir, folded[0].replace(".folded", ".stages"))) as file:
+        print(file.read().rstrip())
+    print(f"Threads sampled: {', '.join(sorted(threads))}")
+    assert {"MainThread", "keep-alive-ld"} <= threads
+
+    # Toggle through the control topic on a local broker stand-in.
+    broker = BrokerStandIn().start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        controlled = Profiler(output_dir=tempfile.mkdtemp())
+        station = MultiBrokerPublisher([("127.0.0.1", broker.port)], "bench-station")
+        station.subscribe("bench/control", lambda topic, payload: controlled.toggle() if payload == b"toggle" else None)
+        station.loop_start()
+        operator = MultiBrokerPublisher([("127.0.0.1", broker.port)], "bench-operator")
+        operator.loop_start()
+        time.sleep(1.0)
+        operator.publish("bench/control", b"toggle", qos=1)
+        time.sleep(0.5)
+        started = controlled.enabled
+        operator.publish("bench/control", b"toggle", qos=1)
+        time.sleep(0.5)
+        controlled.stop(wait=True)
+        written = os.listdir(controlled.output_dir)
+        operator.loop_stop()
+        station.loop_stop()
+    broker.stop()
+    stop.set()
+    print(f"Control topic: started {started}, report files {sorted(written)}")
+    assert started and len(written) == 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import array
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mqtt_publisher import MultiBrokerPublisher
+from mqtt_standin import BrokerStandIn
+from nmea_parser import build_sentence
+from proximity_alerts import ProximityAlertEngine, parse_alert_rules, publish_alerts, strikes_from_text
+
+ALERTS_TOPIC = "bench/alerts"
+RAW_TOPIC = "bench/raw"
+
+
+# Broker stand-in that records when each message on the alerts topic arrives.
+class TimingBroker(BrokerStandIn):
+    def __init__(self):
+        super().__init__()
+        self.condition = threading.Condition()
+        self.arrivals = []
+
+    def _route(self, topic, payload, retain):
+        if topic == ALERTS_TOPIC:
+            with self.condition:
+                self.arrivals.append(time.perf_counter())
+                self.condition.notify()
+        super()._route(topic, payload, retain)
+
+
+# Function to top the normal queue of the (single) broker link up to `backlog` raw sentences.
+def fill_backlog(client, backlog, sentence):
+    for _ in range(backlog - len(client.links[0].queue)):
+        client.publish(RAW_TOPIC, sentence)
+
+
+# Function to time the messages from `start` until the broker has `expected` alerts in total.
+# Returns the latency in us and the raw sentences still queued behind them at that moment.
+def wait_for_arrival(broker, client, start, expected):
+    with broker.condition:
+        if not broker.condition.wait_for(lambda: len(broker.arrivals) >= expected, 10):
+            raise RuntimeError("Alert not delivered within 10 s")
+        queued = len(client.links[0].queue)
+        return (broker.arrivals[expected - 1] - start) * 1e6, queued
+
+
+# Benchmark of the alert fast path, end to end: from a raw 64-byte LD-350 USB read, through the
+# byte-to-text conversion of main.py, the alert engine, MultiBrokerPublisher's priority queue,
+# sender thread and QoS 1 send, until the broker stand-in receives the alert. Before each read
+# the normal queue is filled with `backlog` raw sentences, which the alert must overtake. For
+# comparison, the same alert is also sent through the normal queue behind the same backlog.
+def main():
+    parser = argparse.ArgumentParser(description="Proximity alert latency benchmark.")
+    parser.add_argument("--reads", type=int, default=300, help="Number of simulated USB reads")
+    parser.add_argument("--backlog", type=int, default=2000, help="Raw sentences queued before each read")
+    args = parser.parse_args()
+
+    broker = TimingBroker().start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = MultiBrokerPublisher([("127.0.0.1", broker.port)], "bench-alerts", queue_size=args.backlog * 2)
+        client.loop_start()
+        while not client.links[0].connected:
+            time.sleep(0.05)
+    raw = build_sentence("WIMLN") + "\r\n"
+
+    latencies, overtaken = [], []
+    for _ in range(args.reads):
+        sentence = build_sentence("WIMLI", 10, 12, f"{random.uniform(0, 360):.1f}") + "\r\n"
+        usb_data = array.array("B", sentence.encode("ascii").ljust(64, b"\x00"))
+        engine = ProximityAlertEngine(parse_alert_rules("close:20;nearby:50"))
+        fill_backlog(client, args.backlog, raw)
+
+        with contextlib.redirect_stdout(io.StringIO()):  # Keep console output out of the measurement.
+            start = time.perf_counter()
+            ld_output = "".join([chr(x) for x in usb_data if x != 0])  # Same as main.convert_to_nmea.
+            alerts = engine.evaluate(strikes_from_text(ld_output))
+            publish_alerts(client, ALERTS_TOPIC, alerts)
+            latency, queued = wait_for_arrival(broker, client, start, len(broker.arrivals) + len(alerts))
+        latencies.append(latency)
+        overtaken.append(queued)
+
+    normal = []
+    payload = json.dumps({"rule": "close", "state": "alert", "distance": 10.0})
+    for _ in range(min(args.reads, 20)):
+        fill_backlog(client, args.backlog, raw)
+        start = time.perf_counter()
+        client.publish(ALERTS_TOPIC, payload, qos=1)
+        normal.append(wait_for_arrival(broker, client, start, len(broker.arrivals) + 1)[0])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.loop_stop()
+    broker.stop()
+
+    latencies.sort()
+    print(f"USB bytes to alert at the broker over {args.reads} reads, {args.backlog} raw sentences queued: "
+          f"median {statistics.median(latencies) / 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] / 1000:.2f} ms, max {latencies[-1] / 1000:.2f} ms")
+    print(f"Raw sentences still queued when the alert arrived: median {statistics.median(overtaken):.0f}, "
+          f"min {min(overtaken)}")
+    print(f"Same alert through the normal queue: median {statistics.median(normal) / 1000:.2f} ms")
+    assert min(overtaken) > 0, "An alert waited for the whole normal queue"
+    assert statistics.median(latencies) * 5 < statistics.median(normal), "Alerts do not overtake the normal queue"
+
+
+if __name__ == "__main__":
+    main()
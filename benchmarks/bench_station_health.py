@@ -0,0 +1,114 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mqtt_publisher import MultiBrokerPublisher
+from mqtt_standin import BrokerStandIn
+from station_health import OFFLINE, StationHealth
+from strike_store import StrikeStore
+
+HEALTH_TOPIC = "bench/health"
+
+
+# Function to time StationHealth.record() with `queued` messages waiting on each of three brokers.
+def record_cost(queued, repeat):
+    publisher = MultiBrokerPublisher([("127.0.0.1", 1), ("127.0.0.1", 2), ("127.0.0.1", 3)], "bench-cost",
+                                     queue_size=queued + 1)
+    for i in range(queued):
+        publisher.publish("bench/strikes", str(i))
+    store = StrikeStore(os.path.join(tempfile.mkdtemp(), "strikes.db"))
+    health = StationHealth(publisher, HEALTH_TOPIC, strike_store=store)
+    health.last_data["ld"] = health.last_fix = health.last_loop = time.monotonic()
+    health.status = {"close_strike_rate": 0, "total_strike_rate": 3, "close_alarm": False, "severe_alarm": False,
+                     "heading": 0.0}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        record = health.record()
+    elapsed = (time.perf_counter() - start) / repeat
+    store.close()
+    return elapsed, len(json.dumps(record, separators=(",", ":")))
+
+
+# Station process for the last-will scenario: publishes heartbeats until killed (SIGKILL, no clean
+# disconnect) or interrupted (SIGINT, clean shutdown).
+def run_station(port, interval):
+    client = MultiBrokerPublisher([("127.0.0.1", port)], "bench-station")
+    client.will_set(HEALTH_TOPIC, OFFLINE, qos=1, retain=True)
+    client.loop_start()
+    health = StationHealth(client, HEALTH_TOPIC, interval)
+    health.start()
+    try:
+        while True:
+            health.last_loop = time.monotonic()
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    health.stop()
+    client.loop_stop()
+
+
+# Function to start a station process, wait for its first heartbeat, then end it with `stop_signal`.
+# Returns the status of the last health message received and the seconds it took to arrive.
+def station_lifetime(broker, received, interval, stop_signal):
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--station", str(broker.port),
+                                "--interval", str(interval)], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not (received and received[-1]["status"] == "online") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    process.send_signal(stop_signal)
+    stopped = time.monotonic()
+    process.wait(timeout=10)
+    while received[-1]["status"] != "offline" and time.monotonic() - stopped < 10:
+        time.sleep(0.05)
+    return received[-1]["status"], time.monotonic() - stopped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Station health heartbeat cost and last-will delivery.")
+    parser.add_argument("--repeat", type=int, default=10000, help="Heartbeat records to time")
+    parser.add_argument("--interval", type=float, default=0.5, help="Heartbeat interval of the station process")
+    parser.add_argument("--station", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.station is not None:
+        run_station(args.station, args.interval)
+        return
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        idle, size = record_cost(0, args.repeat)
+        loaded, _ = record_cost(100000, args.repeat)
+    print(f"Heartbeat: {size} bytes; record built in {idle * 1e6:.1f} us with empty queues, "
+          f"{loaded * 1e6:.1f} us with 100,000 messages queued per broker")
+    print(f"Fleet of 500 stations at a 30 s interval: {500 * size / 30:,.0f} bytes/s at the dashboard")
+    assert loaded < idle * 3, "Heartbeat cost grows with the queue depth"
+
+    broker = BrokerStandIn().start()
+    received = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        central = MultiBrokerPublisher([("127.0.0.1", broker.port)], "bench-central")
+        central.subscribe(HEALTH_TOPIC, lambda topic, payload: received.append(json.loads(payload)), qos=1)
+        central.loop_start()
+        time.sleep(0.5)
+        killed, killed_after = station_lifetime(broker, received, args.interval, signal.SIGKILL)
+        heartbeats = sum(1 for record in received if record["status"] == "online")
+        stopped, stopped_after = station_lifetime(broker, received, args.interval, signal.SIGINT)
+        central.loop_stop()
+    retained = json.loads(broker.retained[HEALTH_TOPIC])
+    broker.stop()
+
+    print(f"Killed station: last message {killed!r} after {killed_after:.2f} s (broker will), "
+          f"{heartbeats} heartbeats before")
+    print(f"Stopped station: last message {stopped!r} after {stopped_after:.2f} s; retained {retained}")
+    assert killed == "offline" and stopped == "offline" and retained["status"] == "offline"
+
+
+if __name__ == "__main__":
+    main()
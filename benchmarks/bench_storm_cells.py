@@ -0,0 +1,127 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storm_cells import StormCellTracker
+
+SCATTER_KM = 4.0
+
+
+# Function to draw storms (x0, y0, vx, vy in km and km/s) at least `separation` km apart for the whole run.
+def make_storms(count, minutes, separation=60.0):
+    storms = []
+    while len(storms) < count:
+        storm = (random.uniform(-200, 200), random.uniform(-200, 200),
+                 random.uniform(-40, 40) / 3600, random.uniform(-40, 40) / 3600)
+        if all(math.hypot(storm[0] - other[0] + (storm[2] - other[2]) * t,
+                          storm[1] - other[1] + (storm[3] - other[3]) * t) >= separation
+               for other in storms for t in range(0, minutes * 60 + 1, 60)):
+            storms.append(storm)
+    return storms
+
+
+# Function to generate `rate` strikes per minute, each from a random storm, as (t, bearing, distance).
+def make_strikes(storms, rate, minutes):
+    strikes = []
+    for i in range(rate * minutes):
+        t = i * 60.0 / rate
+        x0, y0, vx, vy = random.choice(storms)
+        x, y = x0 + vx * t + random.gauss(0, SCATTER_KM), y0 + vy * t + random.gauss(0, SCATTER_KM)
+        strikes.append((t, math.degrees(math.atan2(x, y)) % 360, math.hypot(x, y)))
+    return strikes
+
+
+# Function to feed the strikes through a tracker, publishing every `publish_interval` seconds.
+# Returns the tracker, the latest published update of each cell, and the number of updates.
+def track(strikes, publish_interval):
+    tracker = StormCellTracker()
+    latest = {}
+    updates = 0
+    last_publish = 0.0
+    for t, bearing, distance in strikes:
+        tracker.add_strike(t, bearing, distance)
+        if t - last_publish >= publish_interval:
+            for update in tracker.pop_updates(t):
+                latest[update["id"]] = update
+                updates += 1
+            last_publish = t
+    for update in tracker.pop_updates(strikes[-1][0]):
+        latest[update["id"]] = update
+    return tracker, {cell_id: update for cell_id, update in latest.items() if update["strikes"]}, updates
+
+
+# Function to check that each storm is tracked by exactly one established cell (min_strikes or more)
+# moving with the storm's velocity, that stray outlier strikes hold under 1% of the window, and that
+# no cell reports a speed before it has enough strikes spread over enough time.
+def check_cells(storms, minutes, cells, tracker, label, speed_tolerance=4.0, heading_tolerance=10.0):
+    established = [cell for cell in cells.values() if cell["strikes"] >= tracker.min_strikes]
+    stray = sum(cell["strikes"] for cell in cells.values()) - sum(cell["strikes"] for cell in established)
+    assert stray < 0.01 * len(tracker.strikes), f"{label}: {stray} strikes in stray cells"
+    t = minutes * 60
+    for x0, y0, vx, vy in storms:
+        x, y = x0 + vx * t, y0 + vy * t
+        near = [cell for cell in established if math.hypot(cell["x_km"] - x, cell["y_km"] - y) < 20]
+        assert len(near) == 1, f"{label}: storm at ({x:.0f}, {y:.0f}) km tracked by {len(near)} cells"
+        cell = near[0]
+        speed = math.hypot(vx, vy) * 3600
+        heading = math.degrees(math.atan2(vx, vy)) % 360
+        assert cell["speed_kmh"] is not None, f"{label}: cell {cell['id']} has no speed"
+        assert abs(cell["speed_kmh"] - speed) < speed_tolerance, \
+            f"{label}: cell speed {cell['speed_kmh']} km/h, storm {speed:.1f} km/h"
+        if speed > 10:
+            error = abs((cell["heading_deg"] - heading + 180) % 360 - 180)
+            assert error < heading_tolerance, f"{label}: cell heading {cell['heading_deg']}, storm {heading:.0f}"
+    for cell in cells.values():
+        if cell["strikes"] < tracker.min_strikes:
+            assert cell["speed_kmh"] is None, f"{label}: {cell['strikes']}-strike cell reports a speed"
+    assert len(established) == len(storms), f"{label}: {len(established)} cells for {len(storms)} storms"
+
+
+# Benchmark of the storm-cell tracker: several storms drift across the detector range at a
+# configurable strike rate, and the per-strike cost is compared with the real-time budget. The
+# cells at the end must match the storms one to one, with the storms' velocities.
+def main():
+    parser = argparse.ArgumentParser(description="Storm-cell clustering benchmark.")
+    parser.add_argument("--rate", type=int, default=5000, help="Strikes per minute")
+    parser.add_argument("--minutes", type=int, default=60, help="Simulated storm duration")
+    parser.add_argument("--storms", type=int, default=6, help="Number of moving storms")
+    parser.add_argument("--publish-interval", type=float, default=10.0, help="Seconds between cell publishes")
+    args = parser.parse_args()
+
+    random.seed(1)
+    storms = make_storms(args.storms, args.minutes)
+    strikes = make_strikes(storms, args.rate, args.minutes)
+    total = len(strikes)
+    start = time.perf_counter()
+    tracker, cells, updates = track(strikes, args.publish_interval)
+    elapsed = time.perf_counter() - start
+
+    per_strike_us = elapsed * 1e6 / total
+    capacity = total / elapsed * 60
+    print(f"{total:,} strikes at {args.rate:,}/min over {args.minutes} min: {elapsed:.2f} s total")
+    print(f"Per strike: {per_strike_us:.1f} us, capacity {capacity:,.0f} strikes/min "
+          f"({capacity / args.rate:.0f}x the simulated rate)")
+    established = sum(1 for cell in cells.values() if cell["strikes"] >= tracker.min_strikes)
+    print(f"Active cells at end: {established} for {args.storms} storms ({len(cells) - established} stray), "
+          f"cell updates published: {updates}")
+    check_cells(storms, args.minutes, cells, tracker, f"{args.storms} storms")
+
+    # A single storm, stationary and moving east at 40 km/h, at a few strike rates.
+    for rate in (50, 2000):
+        for vx in (0.0, 40.0):
+            random.seed(2)
+            storm = [(30.0, 50.0, vx / 3600, 0.0)]
+            tracker, cells, _ = track(make_strikes(storm, rate, 30), args.publish_interval)
+            cell = max(cells.values(), key=lambda cell: cell["strikes"])
+            print(f"One storm at {vx:.0f} km/h east, {rate}/min: {len(cells)} cell(s), largest "
+                  f"{cell['strikes']} strikes at {cell['speed_kmh']} km/h heading {cell['heading_deg']}")
+            check_cells(storm, 30, cells, tracker, f"one storm at {vx:.0f} km/h, {rate}/min")
+
+
+if __name__ == "__main__":
+    main()
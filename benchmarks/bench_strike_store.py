@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strike_store import StrikeStore, open_database, query_strikes
+
+
+# Benchmark of the strike store: ingest rate through the queued writer, then query latency
+# for typical operator questions over the whole synthetic history.
+def main():
+    parser = argparse.ArgumentParser(description="Strike store ingest and query benchmark.")
+    parser.add_argument("--strikes", type=int, default=1_000_000, help="Number of synthetic strikes")
+    parser.add_argument("--days", type=float, default=90.0, help="Time span of the synthetic history")
+    parser.add_argument("--queries", type=int, default=50, help="Repetitions per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "strikes.db")
+        now = time.time()
+        span = args.days * 86400
+
+        store = StrikeStore(db_path, max_queue=args.strikes)
+        start = time.perf_counter()
+        for i in range(args.strikes):
+            distance = random.uniform(0, 300)
+            store.add(now - span + span * i / args.strikes, distance, distance * 1.1, random.uniform(0, 360))
+        enqueue_time = time.perf_counter() - start
+        store.close()
+        total_time = time.perf_counter() - start
+        print(f"Enqueue: {args.strikes / enqueue_time:,.0f} strikes/s ({enqueue_time * 1e6 / args.strikes:.2f} us per add)")
+        print(f"Ingest:  {store.written / total_time:,.0f} strikes/s, {store.dropped} dropped")
+
+        connection = open_database(db_path)
+        queries = [
+            ("within 20 km, last hour", dict(max_distance=20, since=3600)),
+            ("within 20 km, last day", dict(max_distance=20, since=86400)),
+            ("within 50 km, last 30 days", dict(max_distance=50, since=30 * 86400)),
+            ("within 20 km, bearing 90+/-22.5, last 30 days", dict(max_distance=20, since=30 * 86400, bearing=90, bearing_width=45)),
+        ]
+        for name, kwargs in queries:
+            latencies = []
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                rows = query_strikes(connection, now=now, **kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+            print(f"Query {name}: {len(rows)} rows, median {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
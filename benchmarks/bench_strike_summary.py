@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strike_stats import DISTANCE_BANDS_KM, ROSE_SECTORS
+from strike_summary import StrikeSummary
+
+
+# Function to build the summary histogram with plain Python, for checking the NumPy one.
+def brute_force_counts(strikes):
+    counts = {}
+    for _, distance, bearing in strikes:
+        band = sum(1 for edge in DISTANCE_BANDS_KM if distance >= edge)
+        sector = int(((bearing + 180.0 / ROSE_SECTORS) % 360) // (360.0 / ROSE_SECTORS))
+        counts[(band, sector)] = counts.get((band, sector), 0) + 1
+    return sorted([band, sector, count] for (band, sector), count in counts.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strike summary aggregation cost per interval.")
+    parser.add_argument("--counts", default="100,1000,10000,100000,1000000", help="Strikes per interval")
+    parser.add_argument("--interval", type=float, default=60.0, help="Summary interval in seconds")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    start = 1_700_000_000.0
+    for count in (int(value) for value in args.counts.split(",")):
+        strikes = [(start + rng.uniform(0, args.interval), rng.uniform(0, 300), rng.uniform(0, 360))
+                   for _ in range(count)]
+        summary = StrikeSummary(args.interval)
+
+        begin = time.perf_counter()
+        for t, distance, bearing in strikes:
+            summary.add(t, distance, bearing)
+        add_cost = (time.perf_counter() - begin) / count * 1e9
+
+        begin = time.perf_counter()
+        record = summary.summarize(start + args.interval)
+        aggregate_ms = (time.perf_counter() - begin) * 1000
+
+        payload = json.dumps(record, separators=(",", ":"))
+        raw_bytes = count * len("$WIMLI,123,145,270.5*3C\n")
+        print(f"{count:>9,} strikes: add() {add_cost:.0f} ns/strike, aggregation {aggregate_ms:8.2f} ms, "
+              f"summary {len(payload):,} bytes vs {raw_bytes:,} bytes of raw sentences")
+
+        assert record["strikes"] == count
+        assert sorted(record["counts"]) == brute_force_counts(strikes)
+        assert record["nearest"]["distance"] == min(distance for _, distance, _ in strikes)
+
+
+if __name__ == "__main__":
+    main()
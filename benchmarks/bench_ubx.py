@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nmea_parser import build_sentence, parse_gprmc
+from ubx import NAV_PVT, NAV_PVT_FIELDS, UbxDecoder, build_message, format_gprmc
+
+# One second of default u-blox NMEA output, as read today, and the UBX equivalent.
+NMEA_EPOCH = "\r\n".join([
+    build_sentence("GPRMC", "173005.00", "A", "5130.44399", "N", "00007.66800", "W", "0.021", "", "191026", "", "", "A"),
+    build_sentence("GPVTG", "", "T", "", "M", "0.021", "N", "0.039", "K", "A"),
+    build_sentence("GPGGA", "173005.00", "5130.44399", "N", "00007.66800", "W", "1", "09", "0.93", "50.0", "M", "45.4", "M", "", ""),
+    build_sentence("GPGSA", "A", "3", "02", "05", "13", "15", "18", "20", "23", "24", "29", "", "", "", "1.62", "0.93", "1.32"),
+    build_sentence("GPGSV", "3", "1", "11", "02", "21", "262", "33", "05", "48", "187", "38", "13", "62", "290", "41", "15", "36", "064", "35"),
+    build_sentence("GPGSV", "3", "2", "11", "18", "11", "135", "28", "20", "30", "300", "36", "23", "17", "044", "31", "24", "44", "101", "40"),
+    build_sentence("GPGSV", "3", "3", "11", "29", "62", "208", "42", "30", "05", "320", "", "31", "02", "012", ""),
+    build_sentence("GPGLL", "5130.44399", "N", "00007.66800", "W", "173005.00", "A", "A"),
+]).encode("ascii") + b"\r\n"
+UBX_EPOCH = (build_message(*NAV_PVT, NAV_PVT_FIELDS.pack(0, 2026, 10, 19, 17, 30, 5, 0x07, 20, 0, 3, 0x01, 0, 9,
+                                                        -1278000, 515074000, 50000, 0, 2500, 0, 0, 0, 0, 11, 0)
+                           + bytes(24)))
+
+
+# Function to split a byte stream into USB reads of at most `size` bytes.
+def reads(stream, size):
+    return [stream[offset:offset + size] for offset in range(0, len(stream), size)]
+
+
+def nmea_path(chunks):
+    fixes = 0
+    for data in chunks:
+        text = ''.join([chr(x) for x in data])
+        for line in text.split('\n'):
+            if parse_gprmc(line.strip()) is not None:
+                fixes += 1
+    return fixes
+
+
+def ubx_path(chunks):
+    decoder = UbxDecoder()
+    fixes = 0
+    for data in chunks:
+        for name, record in decoder.feed(data):
+            if name == "NAV-PVT" and record["latitude"] is not None:
+                fixes += 1
+    return fixes
+
+
+# UBX path plus the $GPRMC sentence main.py forwards for each fix.
+def ubx_gprmc_path(chunks):
+    decoder = UbxDecoder()
+    fixes = 0
+    for data in chunks:
+        for name, record in decoder.feed(data):
+            if name == "NAV-PVT" and format_gprmc(record) is not None:
+                fixes += 1
+    return fixes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPS input cost: NMEA text reads versus UBX NAV-PVT.")
+    parser.add_argument("--seconds", type=int, default=36000, help="Seconds of 1 Hz receiver output to process")
+    args = parser.parse_args()
+
+    for name, epoch, path in (("NMEA", NMEA_EPOCH, nmea_path), ("UBX", UBX_EPOCH, ubx_path),
+                                ("UBX + $GPRMC", UBX_EPOCH, ubx_gprmc_path)):
+        chunks = reads(epoch * args.seconds, 512)
+        start = time.perf_counter()
+        fixes = path(chunks)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(epoch)} bytes/s over USB, {len(chunks) / args.seconds:.2f} reads/s, "
+              f"{elapsed / args.seconds * 1e6:.1f} us CPU per second of output, "
+              f"{fixes} of {args.seconds} fixes decoded")
+    # NMEA sentences split across reads are lost; UBX frames are reassembled by the decoder.
+    assert fixes == args.seconds
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import asyncio
+import struct
+import threading
+
+# MQTT 3.1.1 control packet types.
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+
+# Function to match a topic against a subscription filter with '+' and '#' wildcards.
+def topic_matches(topic_filter, topic):
+    filter_parts, topic_parts = topic_filter.split("/"), topic.split("/")
+    for index, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if index >= len(topic_parts) or (part != "+" and part != topic_parts[index]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+def encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def packet(packet_type, body, flags=0):
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+# Function to write a packet unless the connection is already closing (e.g. after stop()).
+def send(writer, data):
+    if not writer.transport.is_closing():
+        writer.write(data)
+
+
+# Minimal local MQTT 3.1.1 broker used as a stand-in for the real brokers in benchmarks and
+# failure scenarios. It acknowledges QoS 0/1/2 publishes, routes them to subscribers, records
+# every received message, keeps retained messages, publishes the will of a client that disconnects
+# without a DISCONNECT packet, and can be stopped and started again on the same port while clients
+# are connected. ack_delay holds back every acknowledgement to simulate a slow broker.
+class BrokerStandIn:
+    def __init__(self, port=0, ack_delay=0.0):
+        self.port = port
+        self.ack_delay = ack_delay
+        self.received = []
+        self.subscriptions = {}
+        self.retained = {}
+        self.wills = {}
+        self.connections = set()
+        self.server = None
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def start(self):
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result()
+
+    def messages(self, topic=None):
+        return [payload for received_topic, payload in list(self.received) if topic is None or received_topic == topic]
+
+    async def _start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", self.port, reuse_address=True)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _stop(self):
+        self.wills.clear()  # A broker that goes down does not publish wills.
+        self.server.close()
+        for writer in list(self.connections):
+            writer.transport.abort()
+        await self.server.wait_closed()
+        self.connections.clear()
+        self.subscriptions.clear()
+
+    async def _handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                if not await self._dispatch(header[0] >> 4, header[0] & 0x0F, body, writer):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            self.subscriptions.pop(writer, None)
+            writer.transport.abort()
+            will = self.wills.pop(writer, None)
+            if will is not None:
+                self._route(*will)
+
+    # Function to record a message, keep it if retained and forward it to the matching subscribers.
+    def _route(self, topic, payload, retain):
+        self.received.append((topic, payload))
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        for subscriber, filters in list(self.subscriptions.items()):
+            if any(topic_matches(topic_filter, topic) for topic_filter in filters):
+                send(subscriber, packet(PUBLISH, struct.pack("!H", len(topic.encode())) + topic.encode() + payload))
+
+    async def _dispatch(self, packet_type, flags, body, writer):
+        if packet_type == CONNECT:
+            # Variable header: protocol name, level, connect flags, keep alive; then the client id.
+            offset = 2 + struct.unpack("!H", body[:2])[0]
+            connect_flags = body[offset + 1]
+            offset += 4
+            offset += 2 + struct.unpack("!H", body[offset:offset + 2])[0]
+            if connect_flags & 0x04:
+                topic_length = struct.unpack("!H", body[offset:offset + 2])[0]
+                topic = body[offset + 2:offset + 2 + topic_length].decode("utf-8")
+                offset += 2 + topic_length
+                payload_length = struct.unpack("!H", body[offset:offset + 2])[0]
+                self.wills[writer] = (topic, body[offset + 2:offset + 2 + payload_length], bool(connect_flags & 0x20))
+            send(writer, packet(CONNACK, b"\x00\x00"))
+        elif packet_type == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            topic_length = struct.unpack("!H", body[:2])[0]
+            topic = body[2:2 + topic_length].decode("utf-8")
+            offset = 2 + topic_length
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+            self._route(topic, body[offset:], bool(flags & 0x01))
+            if qos:
+                if self.ack_delay:
+                    await asyncio.sleep(self.ack_delay)
+                send(writer, packet(PUBACK if qos == 1 else PUBREC, packet_id))
+        elif packet_type == PUBREL:
+            send(writer, packet(PUBCOMP, body[:2]))
+        elif packet_type == SUBSCRIBE:
+            offset, granted, filters = 2, [], []
+            while offset < len(body):
+                topic_length = struct.unpack("!H", body[offset:offset + 2])[0]
+                topic_filter = body[offset + 2:offset + 2 + topic_length].decode("utf-8")
+                filters.append(topic_filter)
+                offset += 3 + topic_length
+                granted.append(0)
+            self.subscriptions.setdefault(writer, []).extend(filters)
+            send(writer, packet(SUBACK, body[:2] + bytes(granted)))
+            for topic, payload in list(self.retained.items()):
+                if any(topic_matches(topic_filter, topic) for topic_filter in filters):
+                    send(writer, packet(PUBLISH, struct.pack("!H", len(topic.encode())) + topic.encode() + payload,
+                                        flags=0x01))
+        elif packet_type == PINGREQ:
+            send(writer, packet(PINGRESP, b""))
+        elif packet_type == DISCONNECT:
+            self.wills.pop(writer, None)  # Clean disconnect: the will is discarded.
+            return False
+        return True
@@ -0,0 +1,168 @@
+#!/bin/bash
+
+# Fast-start launcher. Reuses the existing checkout and virtual environment, waits for the LD-350
+# and the GPS to appear on USB instead of a fixed sleep, and starts main.py straight away: strikes
+# are captured to nmea_output.txt/strikes.db and queued for MQTT until the broker is reachable.
+# A virtual environment built from an older requirements.txt is still used to start, and the new
+# one is built in the background and swapped in the next time main.py starts. main.py is restarted
+# whenever it exits, e.g. when a USB device was unplugged.
+
+# Define variables
+DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+VENV="$DIR/venvpi"
+LOG_FILE="${LOG_FILE:-/home/george/startup_script.log}"
+LD_USB_ID="0403:f241"
+GPS_USB_ID="1546:01a7"
+USB_TIMEOUT="${USB_TIMEOUT:-120}"
+BROKERS="${MQTT_BROKERS:-broker.mqtt.cool:1883}"
+RESTART_DELAY="${RESTART_DELAY:-5}"
+
+# Start logging
+echo "Fast start at $(date), $(cut -d' ' -f1 /proc/uptime) s after boot" > $LOG_FILE
+
+# Modules main.py imports from the virtual environment, used to verify it
+REQUIRED_MODULES="usb.core, paho.mqtt.client, numpy, psutil"
+
+# Function to check that a virtual environment imports everything main.py needs
+venv_imports() {
+  "$1/bin/python" -c "import $REQUIRED_MODULES" >> $LOG_FILE 2>&1
+}
+
+# Function to check that a virtual environment was built from the current requirements.txt and imports cleanly
+venv_current() {
+  [ "$(cat "$1/.requirements.sha256" 2>/dev/null)" = "$(sha256sum "$DIR/requirements.txt" | cut -d' ' -f1)" ] && \
+    venv_imports "$1"
+}
+
+# Function to build $VENV.new from requirements.txt. The hash file is written last, so a build
+# interrupted by a power cut is never mistaken for a complete one.
+build_venv() {
+  local hash
+  hash=$(sha256sum "$DIR/requirements.txt" | cut -d' ' -f1)
+  echo "Building virtual environment $VENV.new" >> $LOG_FILE
+  rm -rf "$VENV.new"
+  if python3 -m venv "$VENV.new" >> $LOG_FILE 2>&1 && \
+     "$VENV.new/bin/pip" install -r "$DIR/requirements.txt" >> $LOG_FILE 2>&1 && venv_imports "$VENV.new"; then
+    echo "$hash" > "$VENV.new/.requirements.sha256"
+    echo "Virtual environment $VENV.new ready" >> $LOG_FILE
+  else
+    echo "pip install failed, keeping the current virtual environment" >> $LOG_FILE
+    rm -rf "$VENV.new"
+  fi
+}
+
+# Function to swap a completed $VENV.new in for $VENV while main.py is not running. Only bin/python
+# is run from the virtual environment, and it does not depend on the directory name. A swap
+# interrupted between the two moves is completed on the next start.
+activate_new_venv() {
+  [ -f "$VENV.new/.requirements.sha256" ] || return 0
+  rm -rf "$VENV.old"
+  [ -d "$VENV" ] && mv "$VENV" "$VENV.old"
+  mv "$VENV.new" "$VENV"
+  rm -rf "$VENV.old"
+  echo "Switched to the rebuilt virtual environment" >> $LOG_FILE
+}
+
+if [ ! -d "$VENV" ] && [ -d "$VENV.old" ]; then
+  mv "$VENV.old" "$VENV"
+fi
+activate_new_venv
+
+# Start with the existing virtual environment whenever it imports cleanly, even if requirements.txt
+# changed: capture must not wait for pip. Only a station without a usable one builds it first.
+if venv_current "$VENV"; then
+  echo "Reusing verified virtual environment $VENV" >> $LOG_FILE
+elif venv_imports "$VENV"; then
+  echo "requirements.txt changed, starting with the previous virtual environment" >> $LOG_FILE
+  REBUILD_VENV=1
+else
+  build_venv
+  activate_new_venv
+fi
+
+# Function to check whether a USB device with the given vendor:product ID is present
+usb_device_present() {
+  for device in /sys/bus/usb/devices/*; do
+    if [ "$(cat "$device/idVendor" 2>/dev/null):$(cat "$device/idProduct" 2>/dev/null)" = "$1" ]; then
+      return 0
+    fi
+  done
+  return 1
+}
+
+# Function to wait for the LD-350 and the GPS to be enumerated rather than sleeping a fixed time:
+# main.py exits if either is missing. Logs the missing devices every USB_TIMEOUT seconds.
+wait_for_devices() {
+  SECONDS=0
+  until usb_device_present "$LD_USB_ID" && usb_device_present "$GPS_USB_ID"; do
+    if [ $SECONDS -ge "$USB_TIMEOUT" ]; then
+      usb_device_present "$LD_USB_ID" || echo "LD-350 ($LD_USB_ID) not found after $USB_TIMEOUT s" >> $LOG_FILE
+      usb_device_present "$GPS_USB_ID" || echo "GPS ($GPS_USB_ID) not found after $USB_TIMEOUT s" >> $LOG_FILE
+      SECONDS=0
+    fi
+    sleep 0.2
+  done
+  echo "LD-350 and GPS ready at $(cut -d' ' -f1 /proc/uptime) s after boot" >> $LOG_FILE
+}
+
+# Function to check whether any of the configured MQTT brokers accepts a TCP connection
+broker_reachable() {
+  for broker in ${BROKERS//,/ }; do
+    host="${broker%%:*}"
+    port="${broker##*:}"
+    [ "$port" = "$host" ] && port=1883
+    timeout 2 bash -c "</dev/tcp/$host/$port" 2>/dev/null && return 0
+  done
+  return 1
+}
+
+# Log when a broker becomes reachable; main.py does not wait for it and queues messages until then
+(
+  until broker_reachable; do
+    sleep 1
+  done
+  echo "MQTT broker reachable at $(cut -d' ' -f1 /proc/uptime) s after boot" >> $LOG_FILE
+) &
+
+# Set the MQTT_TAG environment variable based on the device hostname
+case "$(hostname)" in
+    "rpi1")
+        export MQTT_TAG="NMEA_Lightning_1"
+        ;;
+    "rpi2")
+        export MQTT_TAG="NMEA_Lightning_2"
+        ;;
+    "rpi3")
+        export MQTT_TAG="NMEA_Lightning_3"
+        ;;
+    *)
+        export MQTT_TAG="NMEA_Lightning"
+        ;;
+esac
+echo "MQTT_TAG set to $MQTT_TAG" >> $LOG_FILE 2>&1
+
+# Rebuild an outdated virtual environment and update the checkout in the background. Both take
+# effect the next time main.py starts; a pull that changes requirements.txt triggers another rebuild.
+(
+  [ -n "$REBUILD_VENV" ] && build_venv
+  sleep 60
+  git -C "$DIR" pull --ff-only >> $LOG_FILE 2>&1
+  venv_current "$VENV" || venv_current "$VENV.new" || build_venv
+) &
+UPDATE_PID=$!
+
+# Stop main.py cleanly (it shuts down on SIGTERM) and the background update when the launcher is stopped
+trap 'kill -TERM $MAIN_PID $UPDATE_PID 2>/dev/null; wait $MAIN_PID; echo "Script finished at $(date)" >> $LOG_FILE; exit' INT TERM
+
+# Run main.py, which logs the time to the first sentence, and restart it whenever it exits
+cd "$DIR" || exit
+while true; do
+  activate_new_venv
+  wait_for_devices
+  echo "Running main.py" >> $LOG_FILE 2>&1
+  "$VENV/bin/python" main.py >> $LOG_FILE 2>&1 &
+  MAIN_PID=$!
+  wait "$MAIN_PID"
+  echo "main.py exited with status $? at $(date), restarting in $RESTART_DELAY s" >> $LOG_FILE
+  sleep "$RESTART_DELAY"
+done
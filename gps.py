@@ -3,6 +3,8 @@ import usb.util
 import sys
 import time
 import threading
+import os
+from ubx import UbxDecoder, nmea_mode_commands, ubx_mode_commands
 
 # Function to send a keep-alive command to the USB device.
 def send_keep_alive(dev, endpoint_address):
@@ -52,6 +54,25 @@ except usb.core.USBError as e:
     print("Could not claim interface", interface, ":", e)
     sys.exit(1)
 
+# With GPS_MODE=ubx, switch the receiver to binary NAV-PVT output and print the decoded records; otherwise
+# make sure it sends NMEA, in case an earlier run left it in UBX mode.
+ubx_decoder = None
+if os.getenv("GPS_MODE", "nmea").strip() != "ubx":
+    try:
+        for command in nmea_mode_commands():
+            dev.write(endpoint_out, command)
+    except usb.core.USBError as e:
+        print("Could not configure GPS for NMEA output:", e)
+else:
+    try:
+        for command in ubx_mode_commands(float(os.getenv("GPS_UBX_RATE", "1"))):
+            dev.write(endpoint_out, command)
+        ubx_decoder = UbxDecoder()
+        print("GPS configured for UBX output")
+    except usb.core.USBError as e:
+        print("Could not configure GPS for UBX output:", e)
+        sys.exit(1)
+
 # Start a thread to send keep-alive packets to the device.
 threading.Thread(target=send_keep_alive, args=(dev, endpoint_out), daemon=True).start()
 
@@ -59,18 +80,27 @@ threading.Thread(target=send_keep_alive, args=(dev, endpoint_out), daemon=True).
 try:
     while True:
         try:
-            data = dev.read(endpoint_in, 512, timeout=5000)  # Reading larger chunks of data.
-            nmea_output = ''.join([chr(x) for x in data])  # Directly convert bytes to ASCII string.
-            print(nmea_output)  # Print the NMEA data to stdout.
+            data = dev.read(endpoint_in, 512, timeout=5000)  # Blocks until data arrives, so no sleep is needed.
+            if ubx_decoder is not None:
+                for name, record in ubx_decoder.feed(data):
+                    print(name, record)
+            else:
+                nmea_output = ''.join([chr(x) for x in data])  # Directly convert bytes to ASCII string.
+                print(nmea_output)  # Print the NMEA data to stdout.
         except usb.core.USBError as e:
             print("Error reading data from interface", interface, ":", e)
-        time.sleep(0.01)  # Short delay to prevent high CPU usage.
 
 except KeyboardInterrupt:
     print("Interrupted by user")
 
 finally:
-    # Clean up: release the USB interface and reattach any kernel drivers if needed.
+    # Clean up: put the receiver back to NMEA output, release the USB interface and reattach any kernel drivers.
+    if ubx_decoder is not None:
+        try:
+            for command in nmea_mode_commands():
+                dev.write(endpoint_out, command)
+        except usb.core.USBError as e:
+            print("Could not configure GPS for NMEA output:", e)
     usb.util.release_interface(dev, interface)
     try:
         dev.attach_kernel_driver(interface)
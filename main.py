@@ -3,9 +3,24 @@ import usb.util
 import sys
 import time
 import threading
-import paho.mqtt.client as mqtt_client
 import os
 import datetime
+import signal
+from backfill import BackfillService
+from mqtt_publisher import MultiBrokerPublisher, parse_brokers
+from nmea_parser import STATUS_SENTENCE, parse_gprmc, parse_wimst
+from nmea_server import NmeaServer
+from noise_aggregator import NoiseStatusAggregator
+from profiler import Profiler
+from proximity_alerts import ProximityAlertEngine, parse_alert_rules, publish_alerts, strikes_from_text
+from station_health import OFFLINE, StationHealth
+from storm_cells import StormCellTracker, publish_cell_updates
+from strike_stats import RollingStrikeStats, publish_stats
+from strike_store import StrikeStore
+from strike_summary import StrikeSummary, publish_summary
+from ubx import UbxDecoder, format_gprmc
+from usb_capture import (SOURCE_GPS, SOURCE_LD, configure_nmea_output, configure_ubx_output, start_capture_process,
+                         stop_capture_process)
 
 # Function to empty the NMEA data file every 120 seconds for clean up and to avoid large, unwieldy files.
 def empty_file_every_120_seconds(file_path):
@@ -43,135 +58,419 @@ def convert_to_nmea(data):
         print(f"Error converting data to NMEA: {e}")
         return None
 
-# MQTT callback handlers
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("Connected to MQTT Broker!")
-    else:
-        print(f"Failed to connect, return code {rc}\n")
+# Function to hold back the unfinished last sentence of a read until the rest of it arrives. The LD-350
+# and the GPS are read in 64/512-byte chunks, so a sentence often spans two reads. Returns the complete
+# lines and the new tail; a tail longer than max_length without a line end is dropped.
+def complete_lines(text, partial, max_length=1024):
+    text = partial + text
+    end = text.rfind("\n")
+    tail = text[end + 1:]
+    return text[:end + 1], tail if len(tail) <= max_length else ""
 
-def on_publish(client, userdata, mid):
-    print(f"Message {mid} published.")
+# Start time, used to report the time to the first sentence (see fast-start.sh). Monotonic, as the
+# wall clock may still be stepped by NTP or corrected by the GPS after start.
+started_at = time.monotonic()
+first_sentence_at = None
 
-# Configuration settings for MQTT.
-broker = "broker.mqtt.cool"
-port = 1883
+# Configuration settings for MQTT. MQTT_BROKERS is a comma-separated list of host[:port]; with
+# MQTT_PUBLISH_MODE=fanout every broker gets every message, with failover only the first healthy one.
+brokers = parse_brokers(os.getenv("MQTT_BROKERS", "broker.mqtt.cool:1883"))
+publish_mode = os.getenv("MQTT_PUBLISH_MODE", "fanout").strip()
+broker_queue_size = int(os.getenv("MQTT_QUEUE_SIZE", "1000"))  # Messages queued per broker.
 topic = os.getenv("MQTT_TAG", "NMEA_Lightning_Default").strip()  # Read the MQTT tag from environment variable
 client_id = f"python-mqtt-{int(time.time())}"
 
+# Noise/status aggregation: repeated $WIMLN and $WIMST sentences are collapsed into one summary per interval.
+aggregate_interval = int(os.getenv("AGGREGATE_INTERVAL", "60"))  # Seconds, 0 disables aggregation.
+aggregator = NoiseStatusAggregator(aggregate_interval) if aggregate_interval > 0 else None
+
+# Local strike history store, queried with `python strike_store.py`. An empty STRIKE_DB disables it.
+strike_db = os.getenv("STRIKE_DB", "strikes.db").strip()
+strike_store = StrikeStore(strike_db) if strike_db else None
+
+# Storm-cell clustering over a sliding window of strikes, published on the "<topic>/cells" topic.
+cells_topic = f"{topic}/cells"
+cell_window = int(os.getenv("STORM_CELL_WINDOW", "900"))  # Seconds, 0 disables storm cells.
+cell_publish_interval = float(os.getenv("STORM_CELL_PUBLISH_INTERVAL", "10"))
+cell_tracker = StormCellTracker(cell_window) if cell_window > 0 else None
+last_cell_publish = 0.0
+station_fix = None  # (latitude, longitude) from the latest valid $GPRMC sentence.
+
+# Proximity alerts, published with QoS 1 on "<topic>/alerts" straight after the LD-350 read.
+alerts_topic = f"{topic}/alerts"
+alert_rules = parse_alert_rules(os.getenv("ALERT_RULES", "close:20;nearby:50"),
+                                hysteresis=float(os.getenv("ALERT_HYSTERESIS_KM", "5")),
+                                clear_after=float(os.getenv("ALERT_CLEAR_AFTER", "1800")),
+                                bearing_hysteresis=float(os.getenv("ALERT_HYSTERESIS_DEG", "10")))
+alert_engine = ProximityAlertEngine(alert_rules) if alert_rules else None
+
+# Rolling 5/15/60 minute strike statistics, published retained on "<topic>/stats" at a fixed cadence.
+stats_topic = f"{topic}/stats"
+stats_interval = float(os.getenv("STATS_INTERVAL", "60"))  # Seconds, 0 disables the statistics.
+strike_stats = RollingStrikeStats() if stats_interval > 0 else None
+last_stats_publish = 0.0
+
+# Summary mode for constrained links: with SUMMARY_INTERVAL > 0 (seconds) the raw sentences are no longer
+# published. Strikes are aggregated into one compact record per interval on "<topic>/summary". Only the
+# $WIMLI strikes are kept, in the local strike store, and they only reach the central side if BACKFILL_RATE
+# is set; noise, status and GPS sentences are not kept (nmea_output.txt is emptied every 120 seconds).
+summary_topic = f"{topic}/summary"
+summary_interval = float(os.getenv("SUMMARY_INTERVAL", "0"))
+strike_summary = StrikeSummary(summary_interval) if summary_interval > 0 else None
+if strike_summary is not None and strike_store is None:
+    print("Summary mode without STRIKE_DB: raw strikes will not be kept for backfill")
+
+# Backfill of the strike store to the central aggregator on "<topic>/backfill", acknowledged on
+# "<topic>/backfill/ack". Uploads only go out while the live queues are empty, at up to BACKFILL_RATE
+# bytes per second (0 disables the backfill).
+backfill_rate = float(os.getenv("BACKFILL_RATE", "0"))
+
+# Pipeline mode: "single" reads the USB devices in this process, "multiprocess" reads them in a capture process.
+pipeline_mode = os.getenv("PIPELINE_MODE", "single").strip()
+
+# GPS mode: "nmea" reads the receiver's NMEA text, "ubx" configures it for binary NAV-PVT output at
+# GPS_UBX_RATE solutions per second. In UBX mode each fix is forwarded as one $GPRMC sentence, and the fix
+# time corrects the station clock used to stamp strikes (the Pi has no RTC and may boot without network).
+gps_mode = os.getenv("GPS_MODE", "nmea").strip()
+gps_ubx_rate = float(os.getenv("GPS_UBX_RATE", "1"))
+ubx_decoder = UbxDecoder() if gps_mode == "ubx" else None
+gps_clock_offset = 0.0  # GPS time minus local time, in seconds.
+ld_partial = gps_partial = ""  # Unfinished sentences carried over to the next read.
+
+# Local NMEA network sink: TCP server on NMEA_HOST:NMEA_TCP_PORT (localhost by default, 0.0.0.0 serves the
+# network) and/or UDP broadcast on NMEA_UDP_PORT (0 disables each). A failed bind only disables the sink.
+nmea_tcp_port = int(os.getenv("NMEA_TCP_PORT", "10110"))
+nmea_udp_port = int(os.getenv("NMEA_UDP_PORT", "0"))
+if nmea_tcp_port or nmea_udp_port:
+    nmea_server = NmeaServer(host=os.getenv("NMEA_HOST", "127.0.0.1").strip(), tcp_port=nmea_tcp_port or None,
+                             udp_port=nmea_udp_port, udp_address=os.getenv("NMEA_UDP_ADDRESS", "255.255.255.255"))
+    try:
+        nmea_server.start()
+    except OSError as e:
+        print(f"NMEA server disabled, could not listen on port {nmea_tcp_port}: {e}")
+        nmea_server = None
+else:
+    nmea_server = None
+
+# On-demand profiler: toggled with `kill -USR1 <pid>`, or by publishing "profile start" / "profile stop"
+# to CONTROL_TOPIC (off by default, as anyone on a public broker could publish there; retained commands
+# are ignored). Reports are written to PROFILE_DIR.
+profiler = Profiler(interval=float(os.getenv("PROFILE_INTERVAL", "0.01")), output_dir=os.getenv("PROFILE_DIR", "."))
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+# Shut down cleanly (offline health message, NMEA output restored) when fast-start.sh or systemd stops the station.
+signal.signal(signal.SIGTERM, signal.default_int_handler)
+control_topic = os.getenv("CONTROL_TOPIC", "").strip()
+
+# Station health heartbeat, published retained on "<topic>/health" every HEALTH_INTERVAL seconds (0 disables
+# it). The brokers publish {"status":"offline"} there in its place if the station disconnects uncleanly.
+health_topic = f"{topic}/health"
+health_interval = float(os.getenv("HEALTH_INTERVAL", "30"))
+
 # Debug print to confirm the topic
 print(f"Using MQTT topic: {topic}")
 
-client = mqtt_client.Client(client_id=client_id, protocol=mqtt_client.MQTTv311, transport="tcp")
-client.on_connect = on_connect
-client.on_publish = on_publish
+# Connections are made in the background and retried with backoff, so a broker that is down at
+# startup no longer stops the station from capturing.
+client = MultiBrokerPublisher(brokers, client_id, mode=publish_mode, queue_size=broker_queue_size)
+if health_interval > 0:
+    client.will_set(health_topic, OFFLINE, qos=1, retain=True)
+client.loop_start()
 
-try:
-    client.connect(broker, port, 60)
-    client.loop_start()
-except Exception as e:
-    print(f"Could not connect to MQTT broker: {e}")
-    sys.exit(1)
-
-# USB device setup for LD-350 Lightning Detector
-ld_vendor_id = 0x0403
-ld_product_id = 0xF241
-ld_dev = usb.core.find(idVendor=ld_vendor_id, idProduct=ld_product_id)
-if ld_dev is None:
-    print("LD-350 device not found")
-    sys.exit(1)
-
-ld_interface = 0
-ld_endpoint_out = 0x02
-ld_endpoint_in = 0x81
-
-# USB device setup for GPS USB reader
-gps_vendor_id = 0x1546
-gps_product_id = 0x01a7
-gps_dev = usb.core.find(idVendor=gps_vendor_id, idProduct=gps_product_id)
-if gps_dev is None:
-    print("GPS USB reader not found")
-    sys.exit(1)
-
-gps_interface = 1
-gps_endpoint_in = 0x82
-gps_endpoint_out = 0x01
-
-# Initialize the USB device configurations, claim interfaces, and detach kernel drivers
-def initialize_usb_device(device, interface):
-    if device.is_kernel_driver_active(interface):
+# Function to handle commands on the control topic. Commands are idempotent, as in fan-out mode
+# each one arrives once per broker.
+def handle_control(control_topic, payload):
+    command = payload.decode("utf-8", "replace").strip().lower()
+    if command == "profile start":
+        profiler.start()
+    elif command == "profile stop":
+        profiler.stop()
+    else:
+        print(f"Unknown command on {control_topic}: {command}")
+
+if control_topic:
+    client.subscribe(control_topic, handle_control, retained=False)
+
+if backfill_rate > 0 and strike_store is not None:
+    backfill = BackfillService(strike_db, client, f"{topic}/backfill", rate=backfill_rate)
+    backfill.start()
+else:
+    backfill = None
+
+# In multiprocess mode the USB devices are owned by a separate capture process (usb_capture.py), which
+# passes raw timestamped chunks to this process through a shared-memory ring buffer.
+if pipeline_mode == "multiprocess":
+    ring, capture_process = start_capture_process(gps_ubx_rate=gps_ubx_rate if ubx_decoder is not None else 0.0)
+else:
+    ring = capture_process = None
+
+    # USB device setup for LD-350 Lightning Detector
+    ld_vendor_id = 0x0403
+    ld_product_id = 0xF241
+    ld_dev = usb.core.find(idVendor=ld_vendor_id, idProduct=ld_product_id)
+    if ld_dev is None:
+        print("LD-350 device not found")
+        sys.exit(1)
+
+    ld_interface = 0
+    ld_endpoint_out = 0x02
+    ld_endpoint_in = 0x81
+
+    # USB device setup for GPS USB reader
+    gps_vendor_id = 0x1546
+    gps_product_id = 0x01a7
+    gps_dev = usb.core.find(idVendor=gps_vendor_id, idProduct=gps_product_id)
+    if gps_dev is None:
+        print("GPS USB reader not found")
+        sys.exit(1)
+
+    gps_interface = 1
+    gps_endpoint_in = 0x82
+    gps_endpoint_out = 0x01
+
+    # Initialize the USB device configurations, claim interfaces, and detach kernel drivers
+    def initialize_usb_device(device, interface):
+        if device.is_kernel_driver_active(interface):
+            try:
+                device.detach_kernel_driver(interface)
+                print(f"Kernel driver detached for interface {interface}")
+            except usb.core.USBError as e:
+                print(f"Could not detach kernel driver for interface {interface}: {e}")
+                sys.exit(1)
         try:
-            device.detach_kernel_driver(interface)
-            print(f"Kernel driver detached for interface {interface}")
+            device.set_configuration()
+            usb.util.claim_interface(device, interface)
+            print(f"Interface {interface} claimed")
         except usb.core.USBError as e:
-            print(f"Could not detach kernel driver for interface {interface}: {e}")
+            print(f"Error setting up device on interface {interface}: {e}")
             sys.exit(1)
-    try:
-        device.set_configuration()
-        usb.util.claim_interface(device, interface)
-        print(f"Interface {interface} claimed")
-    except usb.core.USBError as e:
-        print(f"Error setting up device on interface {interface}: {e}")
-        sys.exit(1)
 
-initialize_usb_device(ld_dev, ld_interface)
-initialize_usb_device(gps_dev, gps_interface)
+    initialize_usb_device(ld_dev, ld_interface)
+    initialize_usb_device(gps_dev, gps_interface)
+    if ubx_decoder is not None:
+        configure_ubx_output(gps_dev, gps_endpoint_out, gps_ubx_rate)
+    else:
+        configure_nmea_output(gps_dev, gps_endpoint_out)  # In case an earlier run left it in UBX mode.
+
+    # Start a thread to send keep-alive packets to the LD-350 device.
+    threading.Thread(target=send_keep_alive, args=(gps_dev, gps_endpoint_out), name="keep-alive-gps", daemon=True).start()
+    threading.Thread(target=send_keep_alive, args=(ld_dev, ld_endpoint_out), name="keep-alive-ld", daemon=True).start()
 
-# Start a thread to send keep-alive packets to the LD-350 device.
-threading.Thread(target=send_keep_alive, args=(gps_dev, gps_endpoint_out), daemon=True).start()
-threading.Thread(target=send_keep_alive, args=(ld_dev, ld_endpoint_out), daemon=True).start()
+if health_interval > 0:
+    health = StationHealth(client, health_topic, health_interval, strike_store=strike_store, ring=ring,
+                           nmea_server=nmea_server)
+    health.start()
+else:
+    health = None
 
 # Thread for emptying the file periodically
-threading.Thread(target=empty_file_every_120_seconds, args=("nmea_output.txt",), daemon=True).start()
+threading.Thread(target=empty_file_every_120_seconds, args=("nmea_output.txt",), name="file-cleanup", daemon=True).start()
+
+# Function to get the seconds since the system booted, or None where /proc/uptime is unavailable.
+def seconds_since_boot():
+    try:
+        with open("/proc/uptime") as file:
+            return float(file.read().split()[0])
+    except (OSError, ValueError):
+        return None
 
 # Function to get the current timestamp in ISO format
-def get_current_timestamp():
-    return datetime.datetime.utcnow().isoformat() + 'Z'
+def get_current_timestamp(offset=0.0):
+    return (datetime.datetime.utcnow() + datetime.timedelta(seconds=offset)).isoformat() + 'Z'
+
+# Function to turn decoded UBX records into $GPRMC sentences and update the GPS clock offset from
+# fixes with a valid time. The offset includes the receiver's output latency (tens of milliseconds).
+def handle_ubx_records(records, captured_at):
+    global gps_clock_offset
+    sentences = []
+    for name, record in records:
+        if name != "NAV-PVT" or record["unix_time"] is None:
+            continue
+        offset = record["unix_time"] - captured_at
+        if abs(offset - gps_clock_offset) > 1.0:
+            gps_clock_offset = offset  # Clock stepped, or first fix since boot.
+        else:
+            gps_clock_offset += 0.1 * (offset - gps_clock_offset)
+        sentences.append(format_gprmc(record))
+    return "\n".join(sentences)
 
 # Main loop to read data from both USB devices, merge them, and publish via MQTT.
 try:
     while True:
         try:
-            # Read data from LD-350
-            ld_data = ld_dev.read(ld_endpoint_in, 64, timeout=5000)
-            ld_output = convert_to_nmea(ld_data)
+            profiler.begin()
+            if health is not None:
+                health.last_loop = time.monotonic()
+
+            # Send all-clear messages for alerts without a nearby strike for the clear-after period
+            if alert_engine is not None:
+                publish_alerts(client, alerts_topic, alert_engine.check_clear())
+
+            # Read data from LD-350, or take the next chunk from the capture process
+            if ring is not None:
+                chunk = ring.read(timeout=5.0)
+                if chunk is None:
+                    if capture_process.poll() is not None:
+                        print(f"USB capture process exited with code {capture_process.returncode}")
+                        break
+                    continue
+                source, captured_at, payload = chunk
+                profiler.lap("usb_read")
+                if health is not None:
+                    health.last_data["ld" if source == SOURCE_LD else "gps"] = time.monotonic()
+                ld_output = (convert_to_nmea(payload) or "") if source == SOURCE_LD else ""
+            else:
+                ld_data = ld_dev.read(ld_endpoint_in, 64, timeout=5000)
+                profiler.lap("usb_read")
+                if health is not None:
+                    health.last_data["ld"] = time.monotonic()
+                ld_output = convert_to_nmea(ld_data) or ""
+            ld_output, ld_partial = complete_lines(ld_output, ld_partial)
+            profiler.lap("convert")
+
+            # Fast path: evaluate proximity alerts before the GPS read, file write and normal publish
+            if alert_engine is not None:
+                publish_alerts(client, alerts_topic, alert_engine.evaluate(strikes_from_text(ld_output or "")))
+            profiler.lap("alerts")
             
             # Read data from GPS
-            gps_data = gps_dev.read(gps_endpoint_in, 512, timeout=5000)
-            gps_output = ''.join([chr(x) for x in gps_data])
+            if ring is not None:
+                if source != SOURCE_GPS:
+                    gps_output = ""
+                elif ubx_decoder is not None:
+                    gps_output = handle_ubx_records(ubx_decoder.feed(payload), captured_at)
+                else:
+                    gps_output = ''.join([chr(x) for x in payload])
+            else:
+                gps_data = gps_dev.read(gps_endpoint_in, 512, timeout=5000)
+                profiler.lap("usb_read")
+                if health is not None:
+                    health.last_data["gps"] = time.monotonic()
+                if ubx_decoder is not None:
+                    gps_output = handle_ubx_records(ubx_decoder.feed(gps_data), time.time())
+                else:
+                    gps_output = ''.join([chr(x) for x in gps_data])
+            if ubx_decoder is None:
+                gps_output, gps_partial = complete_lines(gps_output, gps_partial)
+            profiler.lap("convert")
             
             # Combine data
             combined_data = f"{ld_output}\n{gps_output}"
             
-            # Write combined data to file only if it starts with '$' and does not start with '$WIMLN*AB'
-            lines = combined_data.split('\n')
-            filtered_lines = [line for line in lines if line.startswith('$') and not line.startswith('$WIMLN*AB')]
-            with open("nmea_output.txt", "a") as file:
-                for line in filtered_lines:
-                    file.write(line + "\n")
-            
-            # Publish combined data to MQTT with timestamp
-            timestamp = get_current_timestamp()
-            filtered_combined_data = "\n".join(filtered_lines)
-            data_with_timestamp = f"{timestamp}\n{filtered_combined_data}"
-            client.publish(topic, data_with_timestamp)
-            print(f"Published combined data to MQTT on topic {topic}: {data_with_timestamp}")
+            # Write combined data to file only if it starts with '$'. Noise and status sentences are
+            # aggregated into periodic summaries, or '$WIMLN*AB' is dropped when aggregation is disabled.
+            lines = [line.strip() for line in combined_data.split('\n')]
+            if aggregator is not None:
+                filtered_lines = aggregator.process([line for line in lines if line.startswith('$')])
+            else:
+                filtered_lines = [line for line in lines if line.startswith('$') and not line.startswith('$WIMLN*AB')]
+            profiler.lap("filter")
+
+            # Parse strikes and update the station position from the GPS fix (and the health record from
+            # the fix and the $WIMST status)
+            # In multiprocess mode strikes are stamped with the capture time, so a ring backlog does not delay them.
+            received_at = (captured_at if ring is not None else time.time()) + gps_clock_offset
+            strikes = strikes_from_text("\n".join(filtered_lines))  # Complete sentences (with '*') only.
+            for line in lines:
+                fix = parse_gprmc(line)
+                if fix is not None:
+                    station_fix = fix[1:]
+                    if health is not None:
+                        health.last_fix = time.monotonic()
+                elif health is not None and line.startswith(STATUS_SENTENCE):
+                    health.status = parse_wimst(line) or health.status
+            if health is not None:
+                health.strikes += len(strikes)
+
+            # Queue parsed strikes for the local history store
+            if strike_store is not None:
+                for strike in strikes:
+                    strike_store.add(received_at, *strike)
+
+            # Update the storm cells and publish changed cells on their own topic
+            if cell_tracker is not None:
+                for distance, _, bearing in strikes:
+                    cell_tracker.add_strike(received_at, bearing, distance)
+                if received_at - last_cell_publish >= cell_publish_interval:
+                    publish_cell_updates(client, cells_topic, cell_tracker, station_fix, received_at)
+                    last_cell_publish = received_at
+
+            # Count strikes into the rolling statistics and publish them at the configured cadence
+            if strike_stats is not None:
+                for distance, _, bearing in strikes:
+                    strike_stats.add(received_at, distance, bearing)
+                if received_at - last_stats_publish >= stats_interval:
+                    publish_stats(client, stats_topic, strike_stats, received_at)
+                    last_stats_publish = received_at
+
+            # Buffer strikes for the interval summary and publish it when the interval ends
+            if strike_summary is not None:
+                for distance, _, bearing in strikes:
+                    strike_summary.add(received_at, distance, bearing)
+                if strike_summary.due(received_at):
+                    record = publish_summary(client, summary_topic, strike_summary, received_at)
+                    print(f"Published summary of {record['strikes']} strikes on topic {summary_topic}")
+            profiler.lap("analyse")
+
+            if filtered_lines:
+                # Report how long it took from start (and boot) to the first sentence
+                if first_sentence_at is None:
+                    first_sentence_at = time.monotonic()
+                    uptime = seconds_since_boot()
+                    boot_note = f", {uptime:.1f} s after boot" if uptime is not None else ""
+                    print(f"First sentence {first_sentence_at - started_at:.1f} s after start{boot_note}")
+
+                # Forward the sentences to local NMEA clients
+                if nmea_server is not None:
+                    nmea_server.send(filtered_lines)
+
+                with open("nmea_output.txt", "a") as file:
+                    for line in filtered_lines:
+                        file.write(line + "\n")
+                profiler.lap("write")
+
+                # Publish combined data to MQTT with timestamp, unless only summaries are published
+                if strike_summary is None:
+                    timestamp = get_current_timestamp(gps_clock_offset)
+                    filtered_combined_data = "\n".join(filtered_lines)
+                    data_with_timestamp = f"{timestamp}\n{filtered_combined_data}"
+                    client.publish(topic, data_with_timestamp)
+                    print(f"Published combined data to MQTT on topic {topic}: {data_with_timestamp}")
+                profiler.lap("publish")
             
+        except usb.core.USBTimeoutError:
+            pass  # Timeouts are expected when a device is quiet; the health record shows the data age.
         except usb.core.USBError as e:
             print(f"USB Error: {e}")
+            if health is not None:
+                health.usb_errors += 1
         #time.sleep(0.5)  # Adjust the sleep time to reduce the frequency of messages
 
 except KeyboardInterrupt:
     print("Interrupted by user")
 
 finally:
-    usb.util.release_interface(ld_dev, ld_interface)
-    usb.util.release_interface(gps_dev, gps_interface)
-    try:
-        ld_dev.attach_kernel_driver(ld_interface)
-        gps_dev.attach_kernel_driver(gps_interface)
-        print("Kernel drivers reattached for interfaces")
-    except usb.core.USBError as e:
-        print("Error reattaching kernel drivers:", e)
+    if health is not None:
+        health.stop()
+    profiler.stop(wait=True)
+    if ring is not None:
+        stop_capture_process(ring, capture_process)
+    else:
+        if ubx_decoder is not None:
+            configure_nmea_output(gps_dev, gps_endpoint_out)
+        usb.util.release_interface(ld_dev, ld_interface)
+        usb.util.release_interface(gps_dev, gps_interface)
+        try:
+            ld_dev.attach_kernel_driver(ld_interface)
+            gps_dev.attach_kernel_driver(gps_interface)
+            print("Kernel drivers reattached for interfaces")
+        except usb.core.USBError as e:
+            print("Error reattaching kernel drivers:", e)
+    if backfill is not None:
+        backfill.stop()
+    if strike_store is not None:
+        strike_store.close()
+    if nmea_server is not None:
+        nmea_server.close()
     client.loop_stop()
     client.disconnect()
@@ -0,0 +1,303 @@
+import collections
+import contextlib
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt_client
+
+
+# Function to turn off Nagle's algorithm on a new broker connection. paho leaves it on, so a small
+# packet such as an alert written right after a burst of raw sentences waits for the broker's
+# delayed ACK (40 ms on Linux) before it leaves the station.
+def disable_nagle(client, userdata, sock):
+    with contextlib.suppress(AttributeError, OSError):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+# Function to create a paho client with the 1.x callback signatures used throughout this project.
+def create_paho_client(client_id):
+    if hasattr(mqtt_client, "CallbackAPIVersion"):  # paho-mqtt >= 2.0
+        client = mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION1, client_id=client_id,
+                                    protocol=mqtt_client.MQTTv311, transport="tcp")
+    else:
+        client = mqtt_client.Client(client_id=client_id, protocol=mqtt_client.MQTTv311, transport="tcp")
+    client.on_socket_open = disable_nagle
+    return client
+
+
+# Function to parse a broker list written as "host[:port],host[:port],...".
+def parse_brokers(spec, default_port=1883):
+    brokers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        brokers.append((host, int(port) if port else default_port))
+    return brokers
+
+
+# Connection to one broker with its own bounded queue and sender thread. paho's network thread
+# connects in the background and reconnects with exponential backoff; the sender thread only
+# publishes while connected and keeps at most max_inflight messages unacknowledged, so a slow or
+# dead broker only ever fills its own queue (oldest messages are dropped first). Priority
+# messages, such as proximity alerts, have a queue of their own that is always sent first, and
+# bulk messages, such as backfill uploads, one that is only sent when the other two are empty.
+class BrokerLink:
+    def __init__(self, host, port, client_id, queue_size=1000, max_inflight=100, keepalive=60,
+                 client_factory=create_paho_client, on_state_change=None):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.queue_size = queue_size
+        self.max_inflight = max_inflight
+        self.keepalive = keepalive
+        self.on_state_change = on_state_change
+        self.queue = collections.deque()
+        self.priority_queue = collections.deque()
+        self.bulk_queue = collections.deque()
+        self.condition = threading.Condition()
+        self.inflight = {}  # mid -> (sent_at, qos) of the messages paho has not had acknowledged yet.
+        self.early_acks = {}  # mid -> acked_at of acknowledgements that arrived before the sender registered the mid.
+        self.connected = False
+        self.sent = 0
+        self.dropped = 0
+        self.ack_latency = None  # Exponentially weighted moving average, in seconds.
+        self.subscriptions = {}  # Topic filter -> (qos, callback, retained), renewed on every connect.
+        self.will = None
+        self.running = False
+
+        self.client = client_factory(client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_message = self._on_message
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self.thread = threading.Thread(target=self._sender, name=f"mqtt-sender-{self.name}", daemon=True)
+
+    def start(self):
+        self.running = True
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+        if self.will is not None and self.connected:
+            topic, payload, qos, retain = self.will
+            info = self.client.publish(topic, payload, qos=qos, retain=retain)
+            if info.rc == mqtt_client.MQTT_ERR_SUCCESS:
+                info.wait_for_publish(timeout=2.0)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    # Function to queue a message for this broker. Never blocks.
+    def enqueue(self, message, priority=False, bulk=False):
+        queue = self.priority_queue if priority else self.bulk_queue if bulk else self.queue
+        with self.condition:
+            if len(queue) >= self.queue_size:
+                queue.popleft()
+                self.dropped += 1
+            queue.append(message)
+            self.condition.notify()
+
+    # Function to subscribe to a topic filter; callback(topic, payload) runs on paho's network thread.
+    # With retained=False retained messages are ignored, e.g. for commands that must not be replayed.
+    def subscribe(self, topic_filter, callback, qos=0, retained=True):
+        self.subscriptions[topic_filter] = (qos, callback, retained)
+        if self.connected:
+            self.client.subscribe(topic_filter, qos)
+
+    # Function to set the message the broker publishes for this link if it disconnects uncleanly.
+    # Must be called before start(). A clean disconnect discards the will, so stop() publishes it.
+    def will_set(self, topic, payload, qos=0, retain=False):
+        self.will = (topic, payload, qos, retain)
+        self.client.will_set(topic, payload, qos, retain)
+
+    # Function to take every queued message out of this link (used to move them to another broker).
+    # Returns the priority messages and the normal messages.
+    def drain(self):
+        with self.condition:
+            priority, normal = list(self.priority_queue), list(self.queue)
+            self.priority_queue.clear()
+            self.queue.clear()
+        return priority, normal
+
+    # Function to score the broker: the ack latency, or the age of the oldest unacknowledged
+    # message if that is worse. Lower is better; a disconnected broker scores infinity.
+    def health(self, now=None):
+        if not self.connected:
+            return float("inf")
+        now = time.monotonic() if now is None else now
+        with self.condition:
+            oldest = min((sent_at for sent_at, _ in self.inflight.values()), default=now)
+        return max(self.ack_latency or 0.0, now - oldest)
+
+    def stats(self):
+        return {"broker": self.name, "connected": self.connected, "queued": len(self.queue) + len(self.priority_queue),
+                "bulk_queued": len(self.bulk_queue),
+                "inflight": len(self.inflight), "sent": self.sent, "dropped": self.dropped,
+                "ack_latency_ms": None if self.ack_latency is None else round(self.ack_latency * 1000, 1)}
+
+    def _sender(self):
+        while True:
+            with self.condition:
+                while self.running and not (self.connected and (self.priority_queue or self.queue or self.bulk_queue)
+                                            and len(self.inflight) < self.max_inflight):
+                    self.condition.wait(1.0)
+                if not self.running:
+                    return
+                queue = self.priority_queue or self.queue or self.bulk_queue
+                message = queue.popleft()
+
+            # paho calls on_publish with its own locks held, so it must not be called with ours held.
+            topic, payload, qos, retain = message
+            sent_at = time.monotonic()
+            info = self.client.publish(topic, payload, qos=qos, retain=retain)
+            with self.condition:
+                # paho keeps a QoS 1/2 message published while disconnected and sends it on reconnect,
+                # so only other failures (and QoS 0) are put back on the queue.
+                kept_by_paho = info.rc == mqtt_client.MQTT_ERR_NO_CONN and qos > 0
+                if info.rc != mqtt_client.MQTT_ERR_SUCCESS and not kept_by_paho:
+                    queue.appendleft(message)
+                    self.condition.wait(0.1)
+                    continue
+                self.sent += 1
+                acked_at = self.early_acks.pop(info.mid, None)
+                # An acknowledgement from before the publish belongs to an earlier message with the same
+                # mid (paho's mids wrap at 65535), not to this one.
+                if acked_at is None or acked_at < sent_at:
+                    self.inflight[info.mid] = (sent_at, qos)
+                else:
+                    self._record_latency(acked_at - sent_at)
+
+    def _record_latency(self, latency):
+        self.ack_latency = latency if self.ack_latency is None else 0.8 * self.ack_latency + 0.2 * latency
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"Failed to connect to MQTT broker {self.name}, return code {rc}")
+            return
+        print(f"Connected to MQTT broker {self.name}")
+        now = time.monotonic()
+        with self.condition:
+            self.connected = True
+            self.ack_latency = None
+            # paho resends the QoS 1/2 messages still in flight; time their acks from the resend, not
+            # from before the outage.
+            for mid, (_, qos) in self.inflight.items():
+                self.inflight[mid] = (now, qos)
+            self.condition.notify_all()
+        for topic_filter, (qos, _, _) in list(self.subscriptions.items()):
+            self.client.subscribe(topic_filter, qos)
+        if self.on_state_change is not None:
+            self.on_state_change(self)
+
+    def _on_disconnect(self, client, userdata, rc):
+        print(f"Disconnected from MQTT broker {self.name}, return code {rc}")
+        with self.condition:
+            self.connected = False
+            # QoS 0 messages not yet written are lost, but paho keeps QoS 1/2 messages and resends them
+            # after reconnecting, and their acks still arrive, so those stay in flight.
+            self.inflight = {mid: entry for mid, entry in self.inflight.items() if entry[1] > 0}
+            self.early_acks.clear()
+        if self.on_state_change is not None:
+            self.on_state_change(self)
+
+    def _on_publish(self, client, userdata, mid):
+        now = time.monotonic()
+        with self.condition:
+            entry = self.inflight.pop(mid, None)
+            if entry is None:
+                self.early_acks[mid] = now  # Acknowledged before the sender registered it.
+            else:
+                self._record_latency(now - entry[0])
+            self.condition.notify()
+
+    def _on_message(self, client, userdata, message):
+        for topic_filter, (_, callback, retained) in list(self.subscriptions.items()):
+            if message.retain and not retained:
+                continue
+            if mqtt_client.topic_matches_sub(topic_filter, message.topic):
+                callback(message.topic, message.payload)
+
+
+# Publisher over a list of brokers, usable in place of a single paho client (publish, will_set,
+# loop_start, loop_stop, disconnect). In "fanout" mode every message goes to every broker; in "failover" mode
+# it goes to the first connected broker in list order whose health score is below degraded_after
+# seconds, and the queue of a broker that goes down is moved to the new active broker.
+class MultiBrokerPublisher:
+    def __init__(self, brokers, client_id, mode="fanout", queue_size=1000, degraded_after=5.0,
+                 client_factory=create_paho_client):
+        if mode not in ("fanout", "failover"):
+            raise ValueError(f"Unknown publish mode {mode!r}, expected 'fanout' or 'failover'")
+        self.mode = mode
+        self.degraded_after = degraded_after
+        self.links = [BrokerLink(host, port, f"{client_id}-{index}", queue_size, client_factory=client_factory,
+                                 on_state_change=self._on_state_change)
+                      for index, (host, port) in enumerate(brokers)]
+        self.active = self.links[0]
+        self.lock = threading.Lock()
+
+    def loop_start(self):
+        for link in self.links:
+            link.start()
+
+    def loop_stop(self):
+        for link in self.links:
+            link.stop()
+
+    def disconnect(self):
+        pass  # Links disconnect in loop_stop().
+
+    # Function to subscribe to a topic filter on every broker. In fan-out mode the same message can
+    # arrive once per broker, so callbacks should be idempotent.
+    def subscribe(self, topic_filter, callback, qos=0, retained=True):
+        for link in self.links:
+            link.subscribe(topic_filter, callback, qos, retained)
+
+    # Function to set the last-will message on every broker. Must be called before loop_start().
+    def will_set(self, topic, payload, qos=0, retain=False):
+        for link in self.links:
+            link.will_set(topic, payload, qos, retain)
+
+    # Function to publish a message. Never blocks, whatever the state of the brokers. Priority
+    # messages are sent ahead of everything already queued; bulk messages only go to connected
+    # brokers and are sent after everything else.
+    def publish(self, topic, payload=None, qos=0, retain=False, priority=False, bulk=False):
+        message = (topic, payload, qos, retain)
+        if self.mode == "fanout":
+            for link in self.links:
+                if link.connected or not bulk:
+                    link.enqueue(message, priority, bulk)
+        else:
+            self.select_active().enqueue(message, priority, bulk)
+
+    # Function to pick the broker used in failover mode.
+    def select_active(self):
+        now = time.monotonic()
+        with self.lock:
+            connected = [link for link in self.links if link.connected]
+            healthy = [link for link in connected if link.health(now) < self.degraded_after]
+            candidates = healthy or connected
+            active = candidates[0] if candidates else self.active
+            if active is not self.active:
+                print(f"Publishing to MQTT broker {active.name} (was {self.active.name})")
+                previous, self.active = self.active, active
+                priority, normal = previous.drain()
+                for message in priority:
+                    active.enqueue(message, priority=True)
+                for message in normal:
+                    active.enqueue(message)
+            return active
+
+    def stats(self):
+        return [link.stats() for link in self.links]
+
+    def _on_state_change(self, link):
+        if self.mode == "failover" and link.running and link is self.active and not link.connected:
+            self.select_active()
@@ -0,0 +1,372 @@
+import argparse
+import bz2
+import concurrent.futures
+import datetime
+import gzip
+import hashlib
+import lzma
+import mmap
+import os
+import time
+import warnings
+
+import numpy as np
+
+from nmea_parser import parse_gprmc, parse_wimli
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed for the parquet and arrow formats.
+    pyarrow = None
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+LOG_SUFFIXES = (".txt", ".log", ".nmea")
+FORMATS = ("parquet", "arrow", "npz")
+STRIKE_PREFIX = b"$WIMLI,"
+FIX_PREFIXES = (b"$GPRMC,", b"$GNRMC,")
+
+# Hex digit values for checksum validation; 255 marks a non-hex character.
+HEX_VALUES = np.full(256, 255, dtype=np.int16)
+HEX_VALUES[np.frombuffer(b"0123456789", np.uint8)] = np.arange(10)
+HEX_VALUES[np.frombuffer(b"ABCDEF", np.uint8)] = np.arange(10, 16)
+HEX_VALUES[np.frombuffer(b"abcdef", np.uint8)] = np.arange(10, 16)
+
+
+# Function to yield (buffer, start, end) windows of whole lines of a log, about chunk_size bytes
+# each. Plain files are memory-mapped, so windows are views of the page cache; compressed files
+# (.gz, .bz2, .xz) are decompressed in chunks.
+def iter_chunks(path, chunk_size):
+    opener = OPENERS.get(os.path.splitext(path)[1])
+    if opener is None:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                start = 0
+                while start < len(mapped):
+                    end = min(start + chunk_size, len(mapped))
+                    if end < len(mapped):
+                        newline = mapped.rfind(b"\n", start, end)
+                        end = newline + 1 if newline >= start else mapped.find(b"\n", end) + 1 or len(mapped)
+                    yield mapped, start, end
+                    start = end
+        return
+    with opener(path, "rb") as file:
+        remainder = b""
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            data = remainder + data
+            newline = data.rfind(b"\n")
+            if newline < 0:
+                remainder = data
+                continue
+            remainder = data[newline + 1:]
+            yield data, 0, newline + 1
+        if remainder:
+            yield remainder, 0, len(remainder)
+
+
+# Function to find the lines of a byte array that start with `prefix`, narrowing the candidates one
+# byte at a time.
+def lines_starting_with(data, starts, lengths, prefix):
+    lines = np.flatnonzero(lengths >= len(prefix))
+    for offset, char in enumerate(prefix):
+        lines = lines[data[starts[lines] + offset] == char]
+    return lines
+
+
+# Function to split the sentences on `lines` (line indexes into starts/ends) into their fields in
+# one batch. Lines without a '*' are dropped, and with validate=True so are lines with a wrong
+# checksum. Returns {field count: (line indexes, field bytes)}, grouped by field count so that the
+# fields of a group reshape into a matrix; the field bytes are comma-separated with a trailing comma.
+def sentence_fields(data, starts, ends, lines, prefix_length, validate):
+    if not len(lines):
+        return {}
+    line_starts, line_ends = starts[lines], ends[lines]
+    stars = np.flatnonzero(data == ord("*"))
+    commas = np.flatnonzero(data == ord(","))
+    star_index = np.searchsorted(stars, line_starts)
+    star = stars[np.minimum(star_index, len(stars) - 1)] if len(stars) else np.full(len(lines), len(data))
+    valid = (star_index < len(stars)) & (star < line_ends)
+    if validate:
+        valid &= star + 2 < line_ends
+        bounds = np.column_stack((line_starts + 1, np.where(valid, star, line_starts + 2))).ravel()
+        checksum = np.bitwise_xor.reduceat(data, bounds)[::2]
+        digits = np.minimum(star + 1, len(data) - 2)
+        valid &= HEX_VALUES[data[digits]] * 16 + HEX_VALUES[data[digits + 1]] == checksum
+    lines, line_starts, star = lines[valid], line_starts[valid], star[valid]
+    counts = np.searchsorted(commas, star) - np.searchsorted(commas, line_starts)  # Fields after the identifier.
+
+    groups = {}
+    for count in np.unique(counts):
+        selected = counts == count
+        # Select the field bytes of every line, with its '*' turned into a separator.
+        marks = np.zeros(len(data) + 1, dtype=np.int8)
+        marks[line_starts[selected] + prefix_length] = 1
+        marks[star[selected] + 1] = -1
+        fields = data[np.cumsum(marks[:-1], dtype=np.int8) > 0].copy()
+        fields[fields == ord("*")] = ord(",")
+        groups[int(count)] = (lines[selected], fields.tobytes())
+    return groups
+
+
+# Function to split the field bytes of a sentence_fields() group into a matrix of bytes fields.
+def field_matrix(fields, count):
+    return np.array(fields.split(b",")[:-1]).reshape(-1, count)
+
+
+# Function to parse the $WIMLI lines of a chunk in one batch into (line indexes, distance,
+# uncorrected distance, bearing). Groups with an empty or non-numeric field are parsed line by line.
+def parse_strikes(data, starts, ends, lines, validate):
+    parsed_lines, values = [np.empty(0, dtype=np.int64)], [np.empty((0, 3))]
+    for count, (group_lines, fields) in sentence_fields(data, starts, ends, lines, len(STRIKE_PREFIX), validate).items():
+        if count < 3:
+            continue
+        # np.fromstring parses numbers in C, but stops at the first empty or non-numeric field.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            numbers = np.fromstring(fields, sep=",") if count == 3 else np.empty(0)
+        if len(numbers) == len(group_lines) * 3:
+            values.append(numbers.reshape(-1, 3))
+            parsed_lines.append(group_lines)
+            continue
+        try:
+            values.append(field_matrix(fields, count)[:, :3].astype(np.float64))
+            parsed_lines.append(group_lines)
+        except ValueError:
+            for line in group_lines:
+                strike = parse_wimli(bytes(data[starts[line]:ends[line]]).decode("ascii", "replace"))
+                if strike is not None:
+                    values.append(np.array([strike]))
+                    parsed_lines.append(np.array([line]))
+    lines, values = np.concatenate(parsed_lines), np.concatenate(values)
+    order = np.argsort(lines, kind="stable")
+    return lines[order], values[order, 0], values[order, 1], values[order, 2]
+
+
+# Function to convert proleptic Gregorian dates into days since 1970-01-01 (vectorized).
+def days_from_civil(year, month, day):
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+# Function to convert NMEA ddmm.mmmm coordinates and hemispheres into signed degrees (vectorized).
+def coordinates_to_degrees(values, hemispheres, negative):
+    values = values.astype(np.float64)
+    degrees = np.floor(values / 100) + np.mod(values, 100) / 60.0
+    return np.where(hemispheres == negative, -degrees, degrees)
+
+
+# Function to parse the $GPRMC/$GNRMC lines of a chunk in one batch into (line indexes, unix time,
+# latitude, longitude), keeping only fixes with status 'A'. Checksums are always checked, as in
+# parse_gprmc(). Groups that do not convert cleanly are parsed line by line.
+def parse_fixes(data, starts, ends, lines):
+    parsed = [(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0))]
+    for count, (group_lines, fields) in sentence_fields(data, starts, ends, lines, len(FIX_PREFIXES[0]), True).items():
+        if count < 9:
+            continue
+        matrix = field_matrix(fields, count)
+        active = matrix[:, 1] == b"A"
+        group_lines, matrix = group_lines[active], matrix[active]
+        try:
+            clock = np.floor(matrix[:, 0].astype(np.float64)).astype(np.int64)
+            date = matrix[:, 8].astype(np.int64)
+            days = days_from_civil(2000 + date % 100, date // 100 % 100, date // 10000)
+            times = (days * 86400 + clock // 10000 * 3600 + clock // 100 % 100 * 60 + clock % 100).astype(np.float64)
+            parsed.append((group_lines, times, coordinates_to_degrees(matrix[:, 2], matrix[:, 3], b"S"),
+                           coordinates_to_degrees(matrix[:, 4], matrix[:, 5], b"W")))
+        except ValueError:
+            for line in group_lines:
+                fix = parse_gprmc(bytes(data[starts[line]:ends[line]]).decode("ascii", "replace"))
+                if fix is not None:
+                    parsed.append((np.array([line]), np.array([fix[0].replace(tzinfo=datetime.timezone.utc).timestamp()]),
+                                   np.array([fix[1]]), np.array([fix[2]])))
+    lines, times, latitudes, longitudes = (np.concatenate(column) for column in zip(*parsed))
+    order = np.argsort(lines, kind="stable")
+    return lines[order], times[order], latitudes[order], longitudes[order]
+
+
+# Function to parse an ISO 8601 timestamp line (the first line of each MQTT payload) into unix time.
+def parse_timestamp_line(line):
+    try:
+        return datetime.datetime.fromisoformat(line.rstrip("Z")).replace(tzinfo=datetime.timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+# Function to convert one log into the per-day columns of its strikes and fixes. Strikes take the
+# time of the latest preceding $GPRMC fix or ISO timestamp line, carried across chunks; strikes
+# before the first one have a NaN time.
+def convert_log(path, chunk_size, validate):
+    strikes = {"time": [], "distance": [], "uncorrected_distance": [], "bearing": []}
+    fixes = {"time": [], "latitude": [], "longitude": []}
+    stats = {"bytes": 0, "lines": 0, "strikes": 0, "fixes": 0, "rejected": 0}
+    last_time = np.nan
+    for buffer, start, end in iter_chunks(path, chunk_size):
+        data = np.frombuffer(buffer, np.uint8, end - start, start)
+        ends = np.flatnonzero(data == ord("\n"))
+        if not len(ends) or ends[-1] != len(data) - 1:
+            ends = np.append(ends, len(data))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        lengths = ends - starts
+
+        strike_lines = lines_starting_with(data, starts, lengths, STRIKE_PREFIX)
+        lines, distance, uncorrected, bearing = parse_strikes(data, starts, ends, strike_lines, validate)
+        fix_lines = np.concatenate([lines_starting_with(data, starts, lengths, prefix) for prefix in FIX_PREFIXES])
+        fix_lines, fix_times, latitude, longitude = parse_fixes(data, starts, ends, np.sort(fix_lines))
+
+        # Time markers: the fixes and ISO timestamp lines, parsed one by one as there are few.
+        markers, marker_times = [fix_lines], [fix_times]
+        last = len(data) - 1
+        timestamp_lines = np.flatnonzero((lengths >= 20) & (lengths <= 32) & (data[np.minimum(starts + 4, last)] == ord("-"))
+                                         & (data[np.minimum(starts + 10, last)] == ord("T")))
+        for line in timestamp_lines:
+            marker_time = parse_timestamp_line(bytes(data[starts[line]:ends[line]]).decode("ascii", "replace").strip())
+            if marker_time is not None:
+                markers.append(np.array([line]))
+                marker_times.append(np.array([marker_time]))
+        markers, marker_times = np.concatenate(markers), np.concatenate(marker_times)
+        order = np.argsort(markers, kind="stable")
+        markers, marker_times = markers[order], marker_times[order]
+
+        previous = np.searchsorted(markers, lines, side="right") - 1
+        times = marker_times[np.maximum(previous, 0)] if len(markers) else np.full(len(lines), last_time)
+        times = np.where(previous >= 0, times, last_time)
+        if len(markers):
+            last_time = marker_times[-1]
+
+        for column, values in zip(strikes.values(), (times, distance, uncorrected, bearing)):
+            column.append(values)
+        for column, values in zip(fixes.values(), (fix_times, latitude, longitude)):
+            column.append(values)
+        stats["bytes"] += len(data)
+        stats["lines"] += len(starts)
+        stats["strikes"] += len(lines)
+        stats["fixes"] += len(fix_lines)
+        stats["rejected"] += len(strike_lines) - len(lines)
+        del data  # Release the view of the memory map before it is closed.
+
+    strikes = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in strikes.items()}
+    fixes = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in fixes.items()}
+    return strikes, fixes, stats
+
+
+# Function to split columns by UTC day of their "time" column; NaN times go to "unknown".
+def split_by_day(columns):
+    times = columns["time"]
+    known = ~np.isnan(times)
+    days = np.full(len(times), -1, dtype=np.int64)
+    days[known] = np.floor(times[known] / 86400).astype(np.int64)
+    for day in np.unique(days):
+        selected = days == day
+        label = "unknown" if day < 0 else (datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))).isoformat()
+        yield label, {name: values[selected] for name, values in columns.items()}
+
+
+# Function to write one partition as <output>/<dataset>/station=<station>/date=<day>/<name>.<format>.
+# The name is unique to the source log, so an existing file is an earlier conversion of the same log
+# and is replaced. The file is written under a temporary name and renamed into place, so readers of
+# the dataset never see a partial file and an interrupted run leaves the previous one intact.
+def write_partition(output, dataset, station, day, name, columns, output_format):
+    directory = os.path.join(output, dataset, f"station={station}", f"date={day}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.{output_format}")
+    temporary = os.path.join(directory, f".{name}.{output_format}.{os.getpid()}.tmp")  # Hidden from dataset readers.
+    try:
+        with open(temporary, "wb") as file:
+            if output_format == "npz":
+                np.savez(file, **columns)
+            else:
+                table = pyarrow.table(columns)
+                if output_format == "parquet":
+                    pyarrow.parquet.write_table(table, file)
+                else:
+                    pyarrow.feather.write_feather(table, file)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return path
+
+
+# Function to name the partition files of a log: its file name without the known log and compression
+# suffixes, plus a hash of its absolute path, so that logs with the same stem (nmea.txt and nmea.txt.gz,
+# or the same name in two directories) get files of their own.
+def partition_name(path):
+    name = os.path.basename(path)
+    for suffixes in (tuple(OPENERS), LOG_SUFFIXES):
+        if name.endswith(suffixes):
+            name = os.path.splitext(name)[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return f"{name}-{digest}"
+
+
+# Function to convert one log file and write its partitions. Runs in a worker process.
+def convert_file(path, output, output_format, station=None, chunk_size=64 << 20, validate=False):
+    station = station or os.path.basename(os.path.dirname(os.path.abspath(path))) or "unknown"
+    name = partition_name(path)
+    strikes, fixes, stats = convert_log(path, chunk_size, validate)
+    for dataset, columns in (("strikes", strikes), ("fixes", fixes)):
+        for day, day_columns in split_by_day(columns):
+            write_partition(output, dataset, station, day, name, day_columns, output_format)
+    return path, stats
+
+
+# Function to expand the command line paths into log files, searching directories recursively.
+def find_logs(paths):
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                logs += [os.path.join(root, name) for name in sorted(names)
+                         if name.endswith(LOG_SUFFIXES) or name.endswith(tuple(s + c for s in LOG_SUFFIXES for c in OPENERS))]
+        else:
+            logs.append(path)
+    return logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert NMEA logs into columnar strike and fix datasets "
+                                                 "partitioned by station and day.")
+    parser.add_argument("paths", nargs="+", help="Log files or directories (.txt/.log/.nmea, optionally .gz/.bz2/.xz)")
+    parser.add_argument("--output", default="dataset", help="Output directory")
+    parser.add_argument("--format", choices=FORMATS, default="parquet" if pyarrow is not None else "npz",
+                        help="Output format (parquet and arrow need pyarrow)")
+    parser.add_argument("--station", help="Station name (default: the directory containing each log)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="Chunk size in MB")
+    parser.add_argument("--validate", action="store_true", help="Reject $WIMLI sentences with a wrong checksum")
+    args = parser.parse_args()
+    if args.format != "npz" and pyarrow is None:
+        parser.error(f"--format {args.format} needs pyarrow (pip install pyarrow), or use --format npz")
+
+    logs = find_logs(args.paths)
+    totals = {"bytes": 0, "lines": 0, "strikes": 0, "fixes": 0, "rejected": 0}
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(convert_file, path, args.output, args.format, args.station, args.chunk_mb << 20,
+                               args.validate) for path in logs]
+        for future in concurrent.futures.as_completed(futures):
+            path, stats = future.result()
+            for key, value in stats.items():
+                totals[key] += value
+            print(f"{path}: {stats['strikes']} strikes, {stats['fixes']} fixes, {stats['rejected']} rejected")
+    elapsed = time.perf_counter() - start
+    print(f"Converted {len(logs)} files, {totals['bytes'] / 1e9:.2f} GB, {totals['lines']:,} lines, "
+          f"{totals['strikes']:,} strikes, {totals['fixes']:,} fixes in {elapsed:.1f} s "
+          f"({totals['bytes'] / 1e9 / elapsed * 60:.2f} GB/min)")
+
+
+if __name__ == "__main__":
+    main()
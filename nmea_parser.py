@@ -0,0 +1,99 @@
+import datetime
+
+# Sentence identifiers emitted by the LD-350 lightning detector.
+STRIKE_SENTENCE = "$WIMLI"
+NOISE_SENTENCE = "$WIMLN"
+STATUS_SENTENCE = "$WIMST"
+
+
+# Function to compute the NMEA checksum (XOR of every character between '$' and '*').
+def nmea_checksum(body):
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+    return f"{checksum:02X}"
+
+
+# Function to build a complete NMEA sentence from its fields, e.g. build_sentence("PLDSUM", "WIMLN", 5).
+def build_sentence(*fields):
+    body = ",".join(str(field) for field in fields)
+    return f"${body}*{nmea_checksum(body)}"
+
+
+# Function to check the checksum of a sentence. Sentences without a checksum are accepted as-is.
+def checksum_valid(line):
+    line = line.strip()
+    if not line.startswith("$"):
+        return False
+    if "*" not in line:
+        return True
+    body, _, checksum = line[1:].partition("*")
+    return nmea_checksum(body) == checksum[:2].upper()
+
+
+# Function to split a sentence into its identifier (e.g. "$WIMLI") and list of data fields.
+def split_sentence(line):
+    line = line.strip()
+    body = line.split("*", 1)[0]
+    parts = body.split(",")
+    return parts[0], parts[1:]
+
+
+# Function to get the identifier of a sentence, e.g. "$WIMLI,12,14,270.5*3C" -> "$WIMLI".
+def sentence_type(line):
+    return split_sentence(line)[0]
+
+
+# Function to parse a $WIMLI strike sentence into (corrected distance, uncorrected distance, bearing).
+# Returns None if the line is not a valid strike sentence. Checksums are only checked with validate=True,
+# as the LD-350 does not always send standard ones (e.g. '$WIMLN*AB').
+def parse_wimli(line, validate=False):
+    name, fields = split_sentence(line)
+    if name != STRIKE_SENTENCE or len(fields) < 3 or (validate and not checksum_valid(line)):
+        return None
+    try:
+        return float(fields[0]), float(fields[1]), float(fields[2])
+    except ValueError:
+        return None
+
+
+# Function to parse a $WIMST status sentence into a dictionary of its fields.
+# Returns None if the line is not a valid status sentence.
+def parse_wimst(line, validate=False):
+    name, fields = split_sentence(line)
+    if name != STATUS_SENTENCE or len(fields) < 5 or (validate and not checksum_valid(line)):
+        return None
+    try:
+        return {
+            "close_strike_rate": int(fields[0]),
+            "total_strike_rate": int(fields[1]),
+            "close_alarm": fields[2] == "1",
+            "severe_alarm": fields[3] == "1",
+            "heading": float(fields[4]),
+        }
+    except ValueError:
+        return None
+
+
+# Function to convert an NMEA ddmm.mmmm coordinate and hemisphere into signed decimal degrees.
+def nmea_to_degrees(value, hemisphere):
+    degrees_length = 2 if hemisphere in ("N", "S") else 3
+    degrees = float(value[:degrees_length]) + float(value[degrees_length:]) / 60.0
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+
+# Function to parse a $GPRMC (or $GNRMC) sentence into (UTC datetime, latitude, longitude).
+# Returns None if the sentence is invalid or the receiver has no fix.
+def parse_gprmc(line, validate=True):
+    name, fields = split_sentence(line)
+    if name not in ("$GPRMC", "$GNRMC") or len(fields) < 9 or (validate and not checksum_valid(line)):
+        return None
+    if fields[1] != "A":
+        return None
+    try:
+        fix_time = datetime.datetime.strptime(fields[8] + fields[0].split(".")[0], "%d%m%y%H%M%S")
+        latitude = nmea_to_degrees(fields[2], fields[3])
+        longitude = nmea_to_degrees(fields[4], fields[5])
+    except (ValueError, IndexError):
+        return None
+    return fix_time, latitude, longitude
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+
+# Local NMEA network sink for chart plotters and lightning display software. It serves the
+# sentences over TCP to any number of clients and/or as UDP broadcasts, from an asyncio event
+# loop in its own thread. send() only hands the data to that loop, so the USB read loop never
+# waits on a client; a client whose unsent data grows beyond max_client_buffer bytes is disconnected.
+# The TCP server only listens on localhost unless another host (e.g. "0.0.0.0") is given.
+class NmeaServer:
+    def __init__(self, host="127.0.0.1", tcp_port=10110, udp_port=0, udp_address="255.255.255.255",
+                 max_client_buffer=65536):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.udp_address = udp_address
+        self.max_client_buffer = max_client_buffer
+        self.clients = set()
+        self.slow_disconnects = 0
+        self.server = None
+        self.udp_transport = None
+        self.error = None
+        self.running = False
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="nmea-server", daemon=True)
+
+    # Function to start the servers. Returns once they are listening, or raises the OSError of a
+    # failed bind (e.g. the port is taken by another instance).
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+        if self.server is not None:
+            self.tcp_port = self.server.sockets[0].getsockname()[1]
+            print(f"NMEA TCP server listening on port {self.tcp_port}")
+        if self.udp_transport is not None:
+            print(f"NMEA UDP broadcast to {self.udp_address}:{self.udp_port}")
+
+    # Function to send sentences to every client. Safe to call from any thread and never blocks;
+    # does nothing unless the server is running.
+    def send(self, lines):
+        if not self.running:
+            return
+        data = ("\r\n".join(lines) + "\r\n").encode("ascii", "replace")
+        self.loop.call_soon_threadsafe(self._fan_out, data)
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start_servers())
+            self.running = True
+        except OSError as e:
+            self.error = e
+        finally:
+            self.ready.set()
+        if self.error is not None:
+            if self.server is not None:
+                self.server.close()
+            self.loop.close()
+            return
+        self.loop.run_forever()
+        for writer in self.clients:
+            writer.transport.abort()
+        if self.server is not None:
+            self.server.close()
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+
+    async def _start_servers(self):
+        if self.tcp_port is not None:
+            self.server = await asyncio.start_server(self._handle_client, self.host, self.tcp_port)
+        if self.udp_port:
+            self.udp_transport, _ = await self.loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, local_addr=("0.0.0.0", 0), allow_broadcast=True)  # Sending only.
+
+    async def _handle_client(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while await reader.read(1024):  # Clients only listen; anything they send is discarded.
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.transport.abort()
+
+    def _fan_out(self, data):
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() + len(data) > self.max_client_buffer:
+                self.clients.discard(writer)
+                writer.transport.abort()
+                self.slow_disconnects += 1
+                print(f"Disconnected slow NMEA client {writer.get_extra_info('peername')}")
+                continue
+            writer.write(data)
+        if self.udp_transport is not None:
+            self.udp_transport.sendto(data, (self.udp_address, self.udp_port))
@@ -0,0 +1,84 @@
+import datetime
+import time
+
+from nmea_parser import NOISE_SENTENCE, STATUS_SENTENCE, build_sentence, parse_wimst, sentence_type
+
+# Identifier of the summary sentences produced by the aggregator.
+SUMMARY_SENTENCE = "PLDSUM"
+
+
+# Function to format a unix timestamp the same way as the MQTT payload timestamps.
+def format_timestamp(unix_time):
+    return datetime.datetime.utcfromtimestamp(unix_time).isoformat() + "Z"
+
+
+# Collapses repeated $WIMLN noise and $WIMST status sentences into one $PLDSUM summary
+# sentence per type and interval. All other sentences pass straight through, and noise
+# onsets and alarm state changes are forwarded immediately so operators see them without delay.
+class NoiseStatusAggregator:
+    def __init__(self, interval=60):
+        self.interval = interval
+        self.window_start = None
+        self.records = {}
+        self.last_noise_time = None
+        self.last_alarm_state = None
+
+    # Function to feed a batch of sentences. Returns the sentences to write and publish now.
+    def process(self, lines, now=None):
+        now = time.time() if now is None else now
+        if self.window_start is None:
+            self.window_start = now
+
+        forwarded = []
+        for line in lines:
+            name = sentence_type(line)
+            if name == NOISE_SENTENCE:
+                if self.last_noise_time is None or now - self.last_noise_time > self.interval:
+                    forwarded.append(line)  # Noise onset after a quiet interval.
+                self.last_noise_time = now
+                self._record(name, None, now)
+            elif name == STATUS_SENTENCE:
+                status = parse_wimst(line)
+                if status is None:
+                    forwarded.append(line)
+                    continue
+                alarm_state = (status["close_alarm"], status["severe_alarm"])
+                if alarm_state != self.last_alarm_state:
+                    forwarded.append(line)  # Alarm state change.
+                    self.last_alarm_state = alarm_state
+                self._record(name, status, now)
+            else:
+                forwarded.append(line)
+
+        forwarded.extend(self.flush(now))
+        return forwarded
+
+    # Function to return the summary sentences once the interval has elapsed (or immediately with force=True).
+    def flush(self, now=None, force=False):
+        now = time.time() if now is None else now
+        if self.window_start is None or (not force and now - self.window_start < self.interval):
+            return []
+
+        summaries = []
+        for name, record in self.records.items():
+            fields = [SUMMARY_SENTENCE, name[1:], record["count"],
+                      format_timestamp(record["first"]), format_timestamp(record["last"])]
+            status = record["status"]
+            if status is not None:
+                fields += [status["close_strike_rate"], status["total_strike_rate"],
+                           int(status["close_alarm"]), int(status["severe_alarm"]), status["heading"]]
+            summaries.append(build_sentence(*fields))
+
+        self.records = {}
+        self.window_start = now
+        return summaries
+
+    def _record(self, name, status, now):
+        record = self.records.get(name)
+        if record is None:
+            record = {"count": 0, "first": now, "last": now, "status": None}
+            self.records[name] = record
+        record["count"] += 1
+        record["last"] = now
+        if status is not None:
+            record["status"] = status
@@ -0,0 +1,122 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+# Function to format a code object as one frame of a collapsed stack ("function (file.py:line)").
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# On-demand profiler that can be switched on and off while the station is running (SIGUSR1 or
+# the control topic in main.py). While on, a sampling thread records the stack of every other
+# thread every `interval` seconds, and the main loop times its pipeline stages with lap(). When
+# switched off, or after max_duration seconds, it writes two files to output_dir:
+#   profile-<time>.folded  collapsed stacks ("thread;frame;frame count"), readable by
+#                          flamegraph.pl, speedscope and similar tools
+#   profile-<time>.stages  count, total, mean and max time of each pipeline stage
+# When off, lap() is a single attribute check and no thread is running.
+class Profiler:
+    def __init__(self, interval=0.01, max_duration=300.0, output_dir="."):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.output_dir = output_dir
+        self.enabled = False
+        self.samples = collections.Counter()
+        self.stages = {}  # Stage name -> [count, total seconds, max seconds].
+        self.last_lap = 0.0
+        self.thread = None
+        self.labels = {}  # Code object -> frame label cache.
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.enabled:
+                return
+            if self.thread is not None:
+                self.thread.join()  # A previous run is still writing its report.
+            self.samples = collections.Counter()
+            self.stages = {}
+            self.last_lap = time.perf_counter()
+            self.enabled = True
+            self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self.thread.start()
+        print(f"Profiler started, sampling every {self.interval * 1000:.0f} ms")
+
+    # Function to stop profiling. The report is written by the sampling thread, so this is safe to
+    # call from a signal handler or an MQTT callback; wait=True blocks until it has been written.
+    def stop(self, wait=False):
+        self.enabled = False
+        if wait and self.thread is not None:
+            self.thread.join()
+
+    def toggle(self):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+
+    # Function to mark the start of a pipeline iteration, so its first lap() is not charged with
+    # the time spent before it.
+    def begin(self):
+        if self.enabled:
+            self.last_lap = time.perf_counter()
+
+    # Function to charge the time since the previous lap() or begin() to `stage`.
+    def lap(self, stage):
+        if self.enabled:
+            now = time.perf_counter()
+            elapsed = now - self.last_lap
+            self.last_lap = now
+            totals = self.stages.get(stage)
+            if totals is None:
+                self.stages[stage] = [1, elapsed, elapsed]
+            else:
+                totals[0] += 1
+                totals[1] += elapsed
+                if elapsed > totals[2]:
+                    totals[2] = elapsed
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        labels = self.labels
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        started = time.monotonic()
+        while self.enabled and time.monotonic() - started < self.max_duration:
+            self._sample(own_ident)
+            time.sleep(self.interval)
+        self.enabled = False
+        self._write_report(time.monotonic() - started)
+
+    def _write_report(self, duration):
+        prefix = os.path.join(self.output_dir, time.strftime("profile-%Y%m%dT%H%M%S"))
+        with open(prefix + ".folded", "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+        stages = dict(self.stages)
+        measured = sum(totals[1] for totals in stages.values()) or 1.0
+        with open(prefix + ".stages", "w") as file:
+            file.write(f"# {duration:.1f} s profiled\n")
+            file.write(f"{'stage':<12} {'count':>8} {'total_ms':>10} {'mean_ms':>9} {'max_ms':>9} {'share':>6}\n")
+            for stage, (count, total, worst) in sorted(stages.items(), key=lambda item: -item[1][1]):
+                file.write(f"{stage:<12} {count:>8} {total * 1000:>10.1f} {total / count * 1000:>9.3f} "
+                           f"{worst * 1000:>9.3f} {total / measured:>6.1%}\n")
+        print(f"Profiler stopped after {duration:.1f} s, {sum(self.samples.values())} samples written to {prefix}.folded, "
+              f"stage timings to {prefix}.stages")
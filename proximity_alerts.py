@@ -0,0 +1,105 @@
+import json
+import time
+
+from nmea_parser import STRIKE_SENTENCE, parse_wimli
+
+
+# One "strike within X km" rule, optionally limited to a bearing sector. Once raised, the alert
+# stays active while strikes keep arriving within max_distance + hysteresis km (and within the
+# sector widened by bearing_hysteresis degrees on each side), and clears after clear_after seconds
+# without one.
+class AlertRule:
+    def __init__(self, name, max_distance, bearing=None, bearing_width=None, hysteresis=5.0, clear_after=1800,
+                 bearing_hysteresis=10.0):
+        self.name = name
+        self.max_distance = max_distance
+        self.bearing = bearing
+        self.bearing_width = bearing_width
+        self.hysteresis = hysteresis
+        self.bearing_hysteresis = bearing_hysteresis
+        self.clear_after = clear_after
+        self.active = False
+        self.last_strike = None
+
+    # Function to check a strike against the rule, widened by distance_margin km and bearing_margin degrees.
+    def matches(self, distance, bearing, distance_margin=0.0, bearing_margin=0.0):
+        if distance > self.max_distance + distance_margin:
+            return False
+        if self.bearing is None:
+            return True
+        return abs((bearing - self.bearing + 180) % 360 - 180) <= self.bearing_width / 2 + bearing_margin
+
+
+# Function to parse rules written as "name:max_km[:bearing:width]" separated by ';',
+# e.g. "close:20;west:50:270:90". Raises ValueError on a malformed rule.
+def parse_alert_rules(spec, hysteresis=5.0, clear_after=1800, bearing_hysteresis=10.0):
+    rules = []
+    for item in spec.split(";"):
+        if not item.strip():
+            continue
+        fields = item.strip().split(":")
+        if len(fields) not in (2, 4) or not fields[0]:
+            raise ValueError(f"Malformed alert rule {item.strip()!r}, expected name:max_km[:bearing:width]")
+        bearing = float(fields[2]) if len(fields) == 4 else None
+        width = float(fields[3]) if len(fields) == 4 else None
+        rules.append(AlertRule(fields[0], float(fields[1]), bearing, width, hysteresis, clear_after,
+                               bearing_hysteresis))
+    return rules
+
+
+# Function to pull the strikes out of raw LD-350 text without going through the full line filtering.
+# Only complete sentences (ending in a checksum) are used, so a sentence split across USB reads is skipped.
+def strikes_from_text(text):
+    strikes = []
+    for line in text.split("\n"):
+        if line.startswith(STRIKE_SENTENCE) and "*" in line:
+            strike = parse_wimli(line)
+            if strike is not None:
+                strikes.append(strike)
+    return strikes
+
+
+# Evaluates the alert rules on every strike and keeps the alert state of each rule.
+class ProximityAlertEngine:
+    def __init__(self, rules):
+        self.rules = rules
+
+    # Function to evaluate new strikes. Returns the alerts raised by them.
+    def evaluate(self, strikes, now=None):
+        now = time.time() if now is None else now
+        alerts = []
+        for distance, _, bearing in strikes:
+            for rule in self.rules:
+                if rule.matches(distance, bearing):
+                    if not rule.active:
+                        rule.active = True
+                        alerts.append(self._message(rule, "alert", now, distance, bearing))
+                    rule.last_strike = now
+                elif rule.active and rule.matches(distance, bearing, rule.hysteresis, rule.bearing_hysteresis):
+                    rule.last_strike = now
+        return alerts
+
+    # Function to clear the alerts that have had no qualifying strike for clear_after seconds.
+    def check_clear(self, now=None):
+        now = time.time() if now is None else now
+        clears = []
+        for rule in self.rules:
+            if rule.active and now - rule.last_strike >= rule.clear_after:
+                rule.active = False
+                clears.append(self._message(rule, "clear", now))
+        return clears
+
+    def _message(self, rule, state, now, distance=None, bearing=None):
+        message = {"rule": rule.name, "state": state, "max_distance_km": rule.max_distance, "time": now}
+        if distance is not None:
+            message["distance_km"] = distance
+            message["bearing_deg"] = bearing
+        return message
+
+
+# Function to publish alert messages with QoS 1 so they are delivered even over a flaky link,
+# ahead of the messages already queued for the brokers.
+def publish_alerts(client, alerts_topic, alerts):
+    for alert in alerts:
+        client.publish(alerts_topic, json.dumps(alert), qos=1, priority=True)
+        print(f"Proximity alert on topic {alerts_topic}: {alert}")
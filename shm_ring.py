@@ -0,0 +1,103 @@
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# Ring header: capacity, write position, read position, dropped chunks, as native 32-bit words
+# accessed through a memoryview cast. Unlike struct.pack_into with a '<' format, which writes
+# byte by byte, this makes every header update a single aligned store, even on 32-bit Pis.
+# The positions wrap modulo 2**32.
+HEADER_SIZE = 64
+CAPACITY, WRITE_POS, READ_POS, DROPPED = range(4)
+POSITION_MASK = 0xFFFFFFFF
+
+# Record header: payload length, capture time, source. Records are padded to 8 bytes.
+RECORD = struct.Struct("<IdB3x")
+PAD_MARKER = 0xFFFFFFFF
+
+
+# Function to attach to an existing shared memory block without registering it with the resource
+# tracker, which would otherwise unlink it when this process exits (the creating process owns it).
+def attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument and always registers.
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+# Single-producer/single-consumer ring buffer of timestamped chunks in shared memory. The producer
+# only ever advances the write position and the consumer the read position, so no lock is shared
+# between the processes. A full ring drops the new chunk instead of blocking the USB reader.
+class SharedRingBuffer:
+    def __init__(self, name=None, capacity=1 << 20, create=False):
+        if create:
+            if capacity & (capacity - 1):
+                raise ValueError("Ring buffer capacity must be a power of two")
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity)
+        else:
+            self.shm = attach_shared_memory(name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.header = self.buf[:HEADER_SIZE].cast("I")
+        if create:
+            self.header[CAPACITY] = capacity
+            self.header[WRITE_POS] = self.header[READ_POS] = self.header[DROPPED] = 0
+        self.capacity = self.header[CAPACITY]
+        self.owner = create
+
+    @property
+    def dropped(self):
+        return self.header[DROPPED]
+
+    # Function to append a chunk. Returns False (and counts a drop) if the ring is full.
+    def write(self, source, captured_at, payload):
+        size = (RECORD.size + len(payload) + 7) & ~7
+        write_pos = self.header[WRITE_POS]
+        used = (write_pos - self.header[READ_POS]) & POSITION_MASK
+        offset = write_pos % self.capacity
+        tail = self.capacity - offset
+        needed = size + (tail if tail < size else 0)
+        if needed > self.capacity - used:
+            self.header[DROPPED] = (self.header[DROPPED] + 1) & POSITION_MASK
+            return False
+
+        if tail < size:
+            struct.pack_into("<I", self.buf, HEADER_SIZE + offset, PAD_MARKER)
+            write_pos += tail
+            offset = 0
+        start = HEADER_SIZE + offset
+        RECORD.pack_into(self.buf, start, len(payload), captured_at, source)
+        self.buf[start + RECORD.size:start + RECORD.size + len(payload)] = bytes(payload)
+        self.header[WRITE_POS] = (write_pos + size) & POSITION_MASK
+        return True
+
+    # Function to take the next chunk as (source, capture time, payload), waiting up to timeout
+    # seconds. Returns None if nothing arrived in time.
+    def read(self, timeout=0.0, poll_interval=0.0005):
+        deadline = time.monotonic() + timeout
+        read_pos = self.header[READ_POS]
+        while read_pos == self.header[WRITE_POS]:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+        offset = read_pos % self.capacity
+        if struct.unpack_from("<I", self.buf, HEADER_SIZE + offset)[0] == PAD_MARKER:
+            read_pos += self.capacity - offset
+            offset = 0
+        length, captured_at, source = RECORD.unpack_from(self.buf, HEADER_SIZE + offset)
+        start = HEADER_SIZE + offset + RECORD.size
+        payload = bytes(self.buf[start:start + length])
+        self.header[READ_POS] = (read_pos + ((RECORD.size + length + 7) & ~7)) & POSITION_MASK
+        return source, captured_at, payload
+
+    def close(self):
+        self.header.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+
+import psutil
+
+# Payload of the last-will message, published retained on the health topic by the broker when the
+# station disconnects uncleanly, and by the station itself on a clean shutdown.
+OFFLINE = json.dumps({"status": "offline"}, separators=(",", ":"))
+
+# Fields of MultiBrokerPublisher.stats() carried in the heartbeat.
+MQTT_FIELDS = ("broker", "connected", "queued", "bulk_queued", "inflight", "dropped")
+
+
+# Function to round the age of an event in seconds, or None if it has not happened yet.
+def age(since, now):
+    return None if since is None else round(now - since, 1)
+
+
+# Station health heartbeat, published retained on the health topic every `interval` seconds from a
+# thread of its own, so a stalled main loop shows up as a growing loop_age rather than as silence.
+# The record is built only from counters that are already kept: queue lengths and drop counters
+# of the publisher, strike store, ring buffer and NMEA server, and the times of the last device
+# data, GPS fix and main loop pass, which the main loop sets as plain attributes (monotonic time).
+# A device counts as connected if it sent data within the last stale_after seconds.
+class StationHealth:
+    def __init__(self, client, topic, interval=30.0, stale_after=30.0, strike_store=None, ring=None,
+                 nmea_server=None):
+        self.client = client
+        self.topic = topic
+        self.interval = interval
+        self.stale_after = stale_after
+        self.strike_store = strike_store
+        self.ring = ring
+        self.nmea_server = nmea_server
+        self.started = time.monotonic()
+        self.last_data = {"ld": None, "gps": None}
+        self.last_fix = None
+        self.last_loop = None
+        self.status = None  # Latest decoded $WIMST sentence.
+        self.strikes = 0
+        self.usb_errors = 0  # USB errors other than read timeouts.
+        self.process = psutil.Process()
+        self.process.cpu_percent(None)  # The first call only starts the measurement.
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="station-health", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    # Function to build the health record. CPU is the process's average since the previous record.
+    def record(self, now=None):
+        now = time.monotonic() if now is None else now
+        record = {
+            "status": "online",
+            "time": round(time.time(), 1),
+            "uptime": round(now - self.started),
+            "loop_age": age(self.last_loop, now),
+            "devices": {name: {"connected": seen is not None and now - seen < self.stale_after, "age": age(seen, now)}
+                        for name, seen in self.last_data.items()},
+            "fix_age": age(self.last_fix, now),
+            "wimst": self.status,
+            "strikes": self.strikes,
+            "usb_errors": self.usb_errors,
+            "mqtt": [{field: link[field] for field in MQTT_FIELDS} for link in self.client.stats()],
+            "cpu_percent": self.process.cpu_percent(None),
+            "rss_mb": round(self.process.memory_info().rss / 1e6, 1),
+        }
+        if self.strike_store is not None:
+            record["store"] = {"queued": self.strike_store.queue.qsize(), "dropped": self.strike_store.dropped}
+        if self.ring is not None:
+            record["ring_dropped"] = self.ring.dropped
+        if self.nmea_server is not None:
+            record["nmea_slow_disconnects"] = self.nmea_server.slow_disconnects
+        return record
+
+    # Function to publish one heartbeat (retained, so a dashboard sees the latest one on subscribing).
+    def publish(self, now=None):
+        record = self.record(now)
+        self.client.publish(self.topic, json.dumps(record, separators=(",", ":")), qos=1, retain=True)
+        return record
+
+    def _run(self):
+        self.publish()
+        while not self.stopped.wait(self.interval):
+            self.publish()
@@ -0,0 +1,225 @@
+import collections
+import json
+import math
+import time
+
+EARTH_RADIUS_KM = 6371.0
+
+
+# Function to convert a bearing (degrees from north) and distance from the station into local x/y km (east/north).
+def polar_to_xy(bearing, distance):
+    radians = math.radians(bearing)
+    return distance * math.sin(radians), distance * math.cos(radians)
+
+
+# Function to convert local x/y km around the station back into latitude/longitude.
+def xy_to_latlon(station_lat, station_lon, x, y):
+    latitude = station_lat + math.degrees(y / EARTH_RADIUS_KM)
+    longitude = station_lon + math.degrees(x / (EARTH_RADIUS_KM * math.cos(math.radians(station_lat))))
+    return latitude, longitude
+
+
+# Running sums of one storm cell. Strikes are added and removed in O(1), and the centroid and
+# the motion vector (least-squares fit of position over time) are derived from the sums. A cell
+# merged into another keeps a merged_into link, so its expiring strikes are removed from the
+# cell that absorbed them.
+class StormCell:
+    def __init__(self, cell_id, epoch):
+        self.cell_id = cell_id
+        self.epoch = epoch
+        self.count = 0
+        self.sum_t = self.sum_tt = 0.0
+        self.sum_x = self.sum_y = 0.0
+        self.sum_tx = self.sum_ty = 0.0
+        self.last_strike = epoch
+        self.square = None  # Grid square of the centroid, as indexed by the tracker.
+        self.merged_into = None
+
+    def add(self, t, x, y, sign=1):
+        t -= self.epoch
+        self.count += sign
+        self.sum_t += sign * t
+        self.sum_tt += sign * t * t
+        self.sum_x += sign * x
+        self.sum_y += sign * y
+        self.sum_tx += sign * t * x
+        self.sum_ty += sign * t * y
+
+    # Function to add the sums of another cell, shifting its times to this cell's epoch.
+    def absorb(self, other):
+        shift = other.epoch - self.epoch
+        self.count += other.count
+        self.sum_tt += other.sum_tt + 2 * shift * other.sum_t + shift * shift * other.count
+        self.sum_t += other.sum_t + shift * other.count
+        self.sum_x += other.sum_x
+        self.sum_y += other.sum_y
+        self.sum_tx += other.sum_tx + shift * other.sum_x
+        self.sum_ty += other.sum_ty + shift * other.sum_y
+        self.last_strike = max(self.last_strike, other.last_strike)
+
+    def centroid(self):
+        return self.sum_x / self.count, self.sum_y / self.count
+
+    # Function to estimate the time the strikes span, in seconds, from the spread of their times
+    # (the span of evenly spread strikes is sqrt(12) standard deviations).
+    def time_span(self):
+        variance = self.count * self.sum_tt - self.sum_t ** 2
+        return math.sqrt(12 * max(variance, 0.0)) / self.count if self.count else 0.0
+
+    # Function to get the cell velocity in km/h (east, north), or (0, 0) if the strikes span no time.
+    def velocity(self):
+        variance = self.count * self.sum_tt - self.sum_t ** 2
+        if self.count < 3 or variance <= 1e-9 * self.count ** 2:
+            return 0.0, 0.0
+        vx = (self.count * self.sum_tx - self.sum_t * self.sum_x) / variance
+        vy = (self.count * self.sum_ty - self.sum_t * self.sum_y) / variance
+        return vx * 3600, vy * 3600
+
+
+# Incremental storm-cell clustering over a sliding time window. Strikes are kept in a
+# time-ordered deque, and cells in a spatial hash of the grid squares holding their centroids.
+# Each new strike joins the cell with the nearest centroid within join_radius km, or starts a new
+# one; cells whose centroids then come within join_radius of each other are merged, so a storm
+# whose first strikes started several cells ends up as one. Expired strikes are removed from the
+# front of the deque, so each strike costs amortized O(1). Speed and heading are only reported
+# once a cell has min_strikes strikes spanning at least min_span seconds, as a fit over a few
+# strikes seconds apart gives arbitrary velocities.
+class StormCellTracker:
+    def __init__(self, window=900, grid_size=10.0, join_radius=15.0, min_span=300.0, min_strikes=20):
+        self.window = window
+        self.grid_size = grid_size
+        self.join_radius = join_radius
+        self.min_span = min_span
+        self.min_strikes = min_strikes
+        self.strikes = collections.deque()
+        self.grid = collections.defaultdict(set)  # Square -> ids of the cells whose centroid is in it.
+        self.cells = {}
+        self.next_cell_id = 1
+        self.changed = set()
+
+    # Function to add a strike. Returns the id of the cell it was assigned to.
+    def add_strike(self, t, bearing, distance):
+        self.expire(t)
+        x, y = polar_to_xy(bearing, distance)
+
+        nearby = self._cells_near(x, y)
+        cell = min(nearby, key=lambda item: item[0])[1] if nearby else None
+        if cell is None:
+            cell = StormCell(self.next_cell_id, t)
+            self.cells[cell.cell_id] = cell
+            self.next_cell_id += 1
+
+        cell.add(t, x, y)
+        cell.last_strike = t
+        self.strikes.append((t, x, y, cell))
+        self.changed.add(cell.cell_id)
+        self._index(cell)
+        return self._merge_neighbours(cell).cell_id
+
+    # Function to drop strikes older than the window, removing cells that become empty.
+    def expire(self, now):
+        while self.strikes and self.strikes[0][0] < now - self.window:
+            t, x, y, cell = self.strikes.popleft()
+            while cell.merged_into is not None:
+                cell = cell.merged_into
+            cell.add(t, x, y, sign=-1)
+            if cell.count == 0:
+                del self.cells[cell.cell_id]
+                self._unindex(cell)
+            else:
+                self._index(cell)
+            self.changed.add(cell.cell_id)
+
+    # Function to build the updates for cells changed since the last call. Removed and merged cells
+    # are reported with "strikes": 0 so subscribers can drop them.
+    def pop_updates(self, now, station_fix=None):
+        self.expire(now)
+        updates = []
+        for cell_id in sorted(self.changed):
+            cell = self.cells.get(cell_id)
+            if cell is None:
+                updates.append({"id": cell_id, "strikes": 0})
+                continue
+            x, y = cell.centroid()
+            speed = heading = None
+            if cell.count >= self.min_strikes and cell.time_span() >= self.min_span:
+                vx, vy = cell.velocity()
+                speed = round(math.hypot(vx, vy), 1)
+                heading = round(math.degrees(math.atan2(vx, vy)) % 360, 1)
+            update = {
+                "id": cell_id,
+                "strikes": cell.count,
+                "rate_per_min": round(cell.count * 60.0 / self.window, 2),
+                "x_km": round(x, 2),
+                "y_km": round(y, 2),
+                "distance_km": round(math.hypot(x, y), 1),
+                "bearing_deg": round(math.degrees(math.atan2(x, y)) % 360, 1),
+                "speed_kmh": speed,
+                "heading_deg": heading,
+                "last_strike": cell.last_strike,
+            }
+            if station_fix is not None:
+                latitude, longitude = xy_to_latlon(station_fix[0], station_fix[1], x, y)
+                update["lat"] = round(latitude, 5)
+                update["lon"] = round(longitude, 5)
+            updates.append(update)
+        self.changed.clear()
+        return updates
+
+    # Function to find the (distance, cell) pairs of the cells whose centroid is within join_radius of x, y.
+    def _cells_near(self, x, y, exclude=None):
+        square = (int(x // self.grid_size), int(y // self.grid_size))
+        reach = int(math.ceil(self.join_radius / self.grid_size))
+        nearby = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for cell_id in self.grid.get((square[0] + dx, square[1] + dy), ()):
+                    cell = self.cells[cell_id]
+                    if cell is exclude:
+                        continue
+                    cx, cy = cell.centroid()
+                    distance = math.hypot(cx - x, cy - y)
+                    if distance <= self.join_radius:
+                        nearby.append((distance, cell))
+        return nearby
+
+    # Function to merge the cells within join_radius of a cell's centroid into the largest of them.
+    def _merge_neighbours(self, cell):
+        x, y = cell.centroid()
+        for _, other in self._cells_near(x, y, exclude=cell):
+            larger, smaller = (cell, other) if cell.count >= other.count else (other, cell)
+            larger.absorb(smaller)
+            smaller.merged_into = larger
+            del self.cells[smaller.cell_id]
+            self._unindex(smaller)
+            self.changed.update((larger.cell_id, smaller.cell_id))
+            self._index(larger)
+            cell = larger
+        return cell
+
+    # Function to (re)index a cell under the grid square of its centroid.
+    def _index(self, cell):
+        x, y = cell.centroid()
+        square = (int(x // self.grid_size), int(y // self.grid_size))
+        if square != cell.square:
+            self._unindex(cell)
+            self.grid[square].add(cell.cell_id)
+            cell.square = square
+
+    def _unindex(self, cell):
+        if cell.square is None:
+            return
+        ids = self.grid[cell.square]
+        ids.discard(cell.cell_id)
+        if not ids:
+            del self.grid[cell.square]
+        cell.square = None
+
+
+# Function to publish the cell updates as one JSON message on the cells topic.
+def publish_cell_updates(client, cells_topic, tracker, station_fix=None, now=None):
+    now = time.time() if now is None else now
+    updates = tracker.pop_updates(now, station_fix)
+    if updates:
+        client.publish(cells_topic, json.dumps({"time": now, "cells": updates}))
+    return updates
@@ -0,0 +1,79 @@
+import json
+import time
+
+# Upper edges of the distance bands in km; strikes beyond the last edge go into a final open band.
+DISTANCE_BANDS_KM = (10, 20, 50, 100, 200)
+ROSE_SECTORS = 16
+WINDOWS_MINUTES = (5, 15, 60)
+BUCKET_SECONDS = 60
+
+
+# Function to get the label of each distance band, e.g. "0-10", ..., "200+".
+def distance_band_labels():
+    edges = (0,) + DISTANCE_BANDS_KM
+    return [f"{low}-{high}" for low, high in zip(edges, edges[1:])] + [f"{DISTANCE_BANDS_KM[-1]}+"]
+
+
+# Rolling strike statistics over several windows. Strikes are counted into one-minute buckets
+# held in a ring; each window keeps running totals that are incremented per strike and have the
+# bucket leaving the window subtracted when the minute rolls over. Counts are integers, so the
+# totals stay exact, and the cost per strike does not depend on the window length.
+class RollingStrikeStats:
+    def __init__(self, windows=WINDOWS_MINUTES):
+        self.windows = windows
+        self.ring_size = max(windows)
+        self.width = 1 + len(DISTANCE_BANDS_KM) + 1 + ROSE_SECTORS  # Total, distance bands, bearing sectors.
+        self.ring = [[0] * self.width for _ in range(self.ring_size)]
+        self.totals = {window: [0] * self.width for window in windows}
+        self.current_minute = None
+
+    # Function to count a strike received at unix time t.
+    def add(self, t, distance, bearing):
+        self.advance(t)
+        band = 0
+        while band < len(DISTANCE_BANDS_KM) and distance >= DISTANCE_BANDS_KM[band]:
+            band += 1
+        sector = int(((bearing + 180.0 / ROSE_SECTORS) % 360) // (360.0 / ROSE_SECTORS))
+        indexes = (0, 1 + band, 2 + len(DISTANCE_BANDS_KM) + sector)
+
+        bucket = self.ring[self.current_minute % self.ring_size]
+        for index in indexes:
+            bucket[index] += 1
+            for totals in self.totals.values():
+                totals[index] += 1
+
+    # Function to roll the ring forward to the minute of unix time t.
+    def advance(self, t):
+        minute = int(t // BUCKET_SECONDS)
+        if self.current_minute is None:
+            self.current_minute = minute
+            return
+        steps = min(minute - self.current_minute, self.ring_size)
+        for _ in range(max(steps, 0)):
+            self.current_minute += 1
+            for window, totals in self.totals.items():
+                leaving = self.ring[(self.current_minute - window) % self.ring_size]
+                for index, count in enumerate(leaving):
+                    totals[index] -= count
+            self.ring[self.current_minute % self.ring_size] = [0] * self.width
+        self.current_minute = max(self.current_minute, minute)
+
+    # Function to build the statistics record for all windows.
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        self.advance(now)
+        labels = distance_band_labels()
+        windows = {}
+        for window, totals in self.totals.items():
+            windows[f"{window}m"] = {
+                "strikes": totals[0],
+                "rate_per_min": round(totals[0] / window, 2),
+                "distance_bands": dict(zip(labels, totals[1:2 + len(DISTANCE_BANDS_KM)])),
+                "bearing_rose": totals[2 + len(DISTANCE_BANDS_KM):],
+            }
+        return {"time": now, "windows": windows}
+
+
+# Function to publish the statistics record as a retained message on the stats topic.
+def publish_stats(client, stats_topic, stats, now=None):
+    client.publish(stats_topic, json.dumps(stats.snapshot(now)), retain=True)
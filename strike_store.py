@@ -0,0 +1,134 @@
+import argparse
+import datetime
+import queue
+import sqlite3
+import threading
+import time
+
+# Size of the distance and bearing bins used by the strike index.
+DISTANCE_BIN_KM = 5
+BEARING_BIN_DEG = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strikes (
+    ts REAL NOT NULL,
+    distance REAL NOT NULL,
+    uncorrected_distance REAL NOT NULL,
+    bearing REAL NOT NULL,
+    distance_bin INTEGER NOT NULL,
+    bearing_bin INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS strikes_ts ON strikes (ts);
+CREATE INDEX IF NOT EXISTS strikes_bin_ts ON strikes (distance_bin, bearing_bin, ts);
+"""
+
+
+# Function to open a store connection with WAL journaling so readers never block the writer.
+def open_database(db_path):
+    connection = sqlite3.connect(db_path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Function to compute the (distance, bearing) bin of a strike.
+def strike_bins(distance, bearing):
+    return int(distance // DISTANCE_BIN_KM), int((bearing % 360) // BEARING_BIN_DEG)
+
+
+# Local strike history. add() only puts the strike on a bounded queue, and a writer thread
+# inserts queued strikes in batched transactions, so the USB read loop never waits on the disk.
+class StrikeStore:
+    def __init__(self, db_path, batch_size=500, flush_interval=1.0, max_queue=100000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.connection = open_database(db_path)
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, name="strike-store-writer", daemon=True)
+        self.thread.start()
+
+    # Function to queue a strike for storage. Never blocks; strikes are counted as dropped if the queue is full.
+    def add(self, ts, distance, uncorrected_distance, bearing):
+        try:
+            self.queue.put_nowait((ts, distance, uncorrected_distance, bearing))
+        except queue.Full:
+            self.dropped += 1
+
+    # Function to stop the writer thread after the queued strikes have been written.
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.connection.close()
+
+    def _writer(self):
+        while self.running or not self.queue.empty():
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [(ts, distance, uncorrected, bearing) + strike_bins(distance, bearing)
+                    for ts, distance, uncorrected, bearing in batch]
+            try:
+                with self.connection:
+                    self.connection.executemany("INSERT INTO strikes VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.written += len(rows)
+            except sqlite3.Error as e:
+                print(f"Error writing strikes to {self.db_path}: {e}")
+
+
+# Function to find the strikes within max_distance km over the last `since` seconds, optionally
+# limited to a bearing sector. The distance and bearing bins let SQLite seek straight to the
+# matching index ranges instead of scanning the whole time range.
+def query_strikes(connection, max_distance, since, bearing=None, bearing_width=None, now=None):
+    now = time.time() if now is None else now
+    distance_bins = list(range(int(max_distance // DISTANCE_BIN_KM) + 1))
+    if bearing is None:
+        bearing_bins = list(range(360 // BEARING_BIN_DEG))
+    else:
+        low = int(((bearing - bearing_width / 2) % 360) // BEARING_BIN_DEG)
+        count = int(bearing_width // BEARING_BIN_DEG) + 2
+        bearing_bins = sorted({(low + i) % (360 // BEARING_BIN_DEG) for i in range(count)})
+
+    sql = (f"SELECT ts, distance, uncorrected_distance, bearing FROM strikes "
+           f"WHERE distance_bin IN ({','.join('?' * len(distance_bins))}) "
+           f"AND bearing_bin IN ({','.join('?' * len(bearing_bins))}) "
+           f"AND ts >= ? AND distance <= ? ORDER BY ts")
+    rows = connection.execute(sql, distance_bins + bearing_bins + [now - since, max_distance]).fetchall()
+    if bearing is not None:
+        rows = [row for row in rows if abs((row[3] - bearing + 180) % 360 - 180) <= bearing_width / 2]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local LD-350 strike history.")
+    parser.add_argument("--db", default="strikes.db", help="Path of the strike database")
+    parser.add_argument("--within", type=float, default=20.0, help="Maximum distance in km")
+    parser.add_argument("--last", type=float, default=3600.0, help="Time window in seconds")
+    parser.add_argument("--bearing", type=float, help="Centre of the bearing sector in degrees")
+    parser.add_argument("--bearing-width", type=float, default=45.0, help="Width of the bearing sector in degrees")
+    parser.add_argument("--list", action="store_true", help="Print every matching strike")
+    args = parser.parse_args()
+
+    connection = open_database(args.db)
+    start = time.perf_counter()
+    rows = query_strikes(connection, args.within, args.last, args.bearing, args.bearing_width)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if args.list:
+        for ts, distance, uncorrected, bearing in rows:
+            print(f"{datetime.datetime.utcfromtimestamp(ts).isoformat()}Z  {distance:6.1f} km  {bearing:5.1f} deg")
+    print(f"{len(rows)} strikes within {args.within} km in the last {args.last:.0f} s ({elapsed_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
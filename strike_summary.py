@@ -0,0 +1,89 @@
+import collections
+import json
+import time
+
+import numpy as np
+
+from strike_stats import DISTANCE_BANDS_KM, ROSE_SECTORS
+
+TREND_INTERVALS = 5  # Intervals used for the rate trend.
+
+
+# Per-interval strike summary for stations on constrained links. Parsed strikes are appended to
+# plain lists (cheap per strike) and aggregated with NumPy once per interval into a compact record:
+#   counts   non-zero [distance band, bearing sector, count] cells of the band x sector histogram;
+#            band i covers band_edges_km[i-1] to band_edges_km[i], sector 0 is centred on north
+#   nearest  the closest strike of the interval
+#   rate_per_min and rate_trend, the least-squares slope of the rate over the last intervals
+# The raw strikes stay in the local strike store, from which they can be backfilled later.
+class StrikeSummary:
+    def __init__(self, interval=60.0, trend_intervals=TREND_INTERVALS):
+        self.interval = interval
+        self.edges = np.asarray(DISTANCE_BANDS_KM, dtype=np.float64)
+        self.rates = collections.deque(maxlen=trend_intervals)
+        self.times, self.distances, self.bearings = [], [], []
+        self.started = None
+
+    # Function to buffer a strike received at unix time t.
+    def add(self, t, distance, bearing):
+        if self.started is None:
+            self.started = t
+        self.times.append(t)
+        self.distances.append(distance)
+        self.bearings.append(bearing)
+
+    # Function to check whether the current interval has ended at unix time `now`.
+    def due(self, now):
+        if self.started is None:
+            self.started = now
+        return now - self.started >= self.interval
+
+    # Function to aggregate the buffered strikes into the summary record and start a new interval.
+    def summarize(self, now=None):
+        now = time.time() if now is None else now
+        start = self.started if self.started is not None else now
+        times = np.asarray(self.times, dtype=np.float64)
+        distances = np.asarray(self.distances, dtype=np.float64)
+        bearings = np.asarray(self.bearings, dtype=np.float64)
+        self.times, self.distances, self.bearings = [], [], []
+        self.started = now
+
+        bands = np.searchsorted(self.edges, distances, side="right")
+        sectors = (np.mod(bearings + 180.0 / ROSE_SECTORS, 360.0) // (360.0 / ROSE_SECTORS)).astype(np.intp)
+        histogram = np.bincount(bands * ROSE_SECTORS + sectors,
+                                minlength=(len(DISTANCE_BANDS_KM) + 1) * ROSE_SECTORS)
+        cells = np.flatnonzero(histogram)
+        counts = np.column_stack((cells // ROSE_SECTORS, cells % ROSE_SECTORS, histogram[cells])).tolist()
+
+        nearest = None
+        if len(distances):
+            index = int(np.argmin(distances))
+            nearest = {"distance": float(distances[index]), "bearing": float(bearings[index]),
+                       "time": round(float(times[index]), 3)}
+
+        minutes = max(now - start, 1e-9) / 60.0
+        rate = len(distances) / minutes
+        self.rates.append((now / 60.0, rate))
+        trend = 0.0
+        if len(self.rates) >= 2:
+            points = np.asarray(self.rates)
+            trend = float(np.polyfit(points[:, 0] - points[-1, 0], points[:, 1], 1)[0])
+
+        return {
+            "start": round(start, 3),
+            "end": round(now, 3),
+            "strikes": len(distances),
+            "band_edges_km": list(DISTANCE_BANDS_KM),
+            "sectors": ROSE_SECTORS,
+            "counts": counts,
+            "nearest": nearest,
+            "rate_per_min": round(rate, 2),
+            "rate_trend": round(trend, 3),  # Change in strikes/min per minute.
+        }
+
+
+# Function to publish the summary of the interval that ended at `now` on the summary topic.
+def publish_summary(client, summary_topic, summary, now=None):
+    record = summary.summarize(now)
+    client.publish(summary_topic, json.dumps(record, separators=(",", ":")), qos=1)
+    return record
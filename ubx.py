@@ -0,0 +1,164 @@
+import calendar
+import operator
+import struct
+import time
+
+from nmea_parser import build_sentence
+
+# UBX frame: sync chars, class, id, little-endian payload length, payload, 2-byte Fletcher checksum.
+SYNC = b"\xb5\x62"
+HEADER = struct.Struct("<BBH")
+
+# Message classes and ids used here (u-blox 7/8/M8 protocol).
+NAV_PVT = (0x01, 0x07)
+TIM_TP = (0x0D, 0x01)
+CFG_PRT = (0x06, 0x00)
+CFG_MSG = (0x06, 0x01)
+CFG_RATE = (0x06, 0x08)
+MESSAGE_NAMES = {NAV_PVT: "NAV-PVT", TIM_TP: "TIM-TP"}
+
+USB_PORT = 3  # Port id of the USB interface in CFG-PRT.
+PROTO_UBX, PROTO_NMEA = 0x01, 0x02
+
+# NAV-PVT fields up to the heading of motion (the first 68 of 92 bytes) and the full TIM-TP payload.
+NAV_PVT_FIELDS = struct.Struct("<IHBBBBBBIiBBBBiiiiIIiiiii")
+TIM_TP_FIELDS = struct.Struct("<IIiHBB")
+
+GPS_EPOCH = calendar.timegm((1980, 1, 6, 0, 0, 0))
+GPS_LEAP_SECONDS = 18  # GPS - UTC since 2017-01-01; only used for TIM-TP pulses in GNSS time.
+MAX_PAYLOAD = 1024  # Longer lengths are treated as a false sync match.
+
+
+# Function to compute the 8-bit Fletcher checksum over class, id, length and payload. The running
+# sum B is the sum of every byte weighted by how many running sums it is part of, which keeps the
+# loop in C: A = sum(data), B = sum((n - i) * data[i]).
+def ubx_checksum(data):
+    return bytes((sum(data) & 0xFF, sum(map(operator.mul, data, range(len(data), 0, -1))) & 0xFF))
+
+
+# Function to build a complete UBX frame, e.g. build_message(*CFG_MSG, b"\x01\x07\x01").
+def build_message(msg_class, msg_id, payload=b""):
+    body = HEADER.pack(msg_class, msg_id, len(payload)) + payload
+    return SYNC + body + ubx_checksum(body)
+
+
+# Function to build the messages that switch the USB port to UBX-only output with NAV-PVT at
+# `rate` solutions per second. Send them in order to the GPS out endpoint. TIM-TP is switched off:
+# without a PPS line its arrival over USB is no better a time reference than NAV-PVT.
+def ubx_mode_commands(rate=1.0):
+    measurement_ms = max(25, int(round(1000 / rate)))
+    return [
+        build_message(*CFG_PRT, struct.pack("<BBHIIHHHH", USB_PORT, 0, 0, 0, 0,
+                                            PROTO_UBX | PROTO_NMEA, PROTO_UBX, 0, 0)),
+        build_message(*CFG_RATE, struct.pack("<HHH", measurement_ms, 1, 0)),  # Aligned to UTC.
+        build_message(*CFG_MSG, bytes((*NAV_PVT, 1))),
+        build_message(*CFG_MSG, bytes((*TIM_TP, 0))),
+    ]
+
+
+# Function to build the messages that put the USB port back to NMEA output at 1 Hz. Sent on shutdown
+# and when starting in NMEA mode, so a receiver left in UBX mode never feeds binary to the NMEA path.
+def nmea_mode_commands():
+    return [
+        build_message(*CFG_PRT, struct.pack("<BBHIIHHHH", USB_PORT, 0, 0, 0, 0,
+                                            PROTO_UBX | PROTO_NMEA, PROTO_NMEA, 0, 0)),
+        build_message(*CFG_RATE, struct.pack("<HHH", 1000, 1, 0)),
+    ]
+
+
+# Function to decode a NAV-PVT payload into a fix record. unix_time is None unless the receiver
+# reports a valid, fully resolved date and time; latitude/longitude are None without a fix.
+def decode_nav_pvt(payload):
+    (itow, year, month, day, hour, minute, second, valid, time_accuracy, nano, fix_type, flags, _, satellites,
+     lon, lat, height, _, horizontal_accuracy, _, _, _, _, ground_speed, heading) = NAV_PVT_FIELDS.unpack_from(payload)
+    fix_ok = bool(flags & 0x01) and fix_type in (2, 3, 4)
+    time_ok = valid & 0x07 == 0x07  # validDate, validTime and fullyResolved.
+    return {
+        "unix_time": calendar.timegm((year, month, day, hour, minute, second)) + nano * 1e-9 if time_ok else None,
+        "latitude": lat * 1e-7 if fix_ok else None,
+        "longitude": lon * 1e-7 if fix_ok else None,
+        "height": height / 1000.0,
+        "fix_type": fix_type,
+        "satellites": satellites,
+        "time_accuracy_ns": time_accuracy,
+        "horizontal_accuracy_m": horizontal_accuracy / 1000.0,
+        "ground_speed": ground_speed / 1000.0,
+        "heading": heading * 1e-5,
+        "itow": itow,
+    }
+
+
+# Function to decode a TIM-TP payload into the UTC time (unix seconds) of the next time pulse.
+def decode_tim_tp(payload):
+    tow_ms, tow_sub_ms, quantization_error, week, flags, _ = TIM_TP_FIELDS.unpack_from(payload)
+    pulse_time = GPS_EPOCH + week * 604800 + (tow_ms + tow_sub_ms / 2 ** 32) / 1000.0
+    if not flags & 0x01:  # Time base is GNSS time rather than UTC.
+        pulse_time -= GPS_LEAP_SECONDS
+    return {"pulse_time": pulse_time, "quantization_error_ps": quantization_error, "utc_available": bool(flags & 0x02)}
+
+
+DECODERS = {NAV_PVT: decode_nav_pvt, TIM_TP: decode_tim_tp}
+
+
+# Incremental UBX stream decoder. USB reads split frames anywhere, so unconsumed bytes are kept
+# between calls; anything between frames (e.g. NMEA left over from before configuration) is skipped.
+class UbxDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bad_checksums = 0
+
+    # Function to add received bytes and return the (message name, record) pairs completed by them.
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        records = []
+        start = 0
+        view = memoryview(buffer)
+        try:
+            while True:
+                start = buffer.find(SYNC, start)
+                if start < 0 or len(buffer) - start < 8:
+                    break
+                msg_class, msg_id, length = HEADER.unpack_from(buffer, start + 2)
+                if length > MAX_PAYLOAD:
+                    start += 2
+                    continue
+                end = start + 6 + length + 2
+                if end > len(buffer):
+                    break
+                if ubx_checksum(view[start + 2:end - 2]) != buffer[end - 2:end]:
+                    self.bad_checksums += 1
+                    start += 2
+                    continue
+                decoder = DECODERS.get((msg_class, msg_id))
+                if decoder is not None:
+                    records.append((MESSAGE_NAMES[(msg_class, msg_id)], decoder(view[start + 6:end - 2])))
+                start = end
+        finally:
+            view.release()
+        if start < 0:
+            # No sync in the buffer; keep a trailing 0xb5 that may start the next frame.
+            del buffer[:-1 if buffer.endswith(SYNC[:1]) else len(buffer)]
+        else:
+            del buffer[:start]
+        return records
+
+
+# Function to format a NAV-PVT fix record as a $GPRMC sentence, so MQTT subscribers and NMEA
+# clients still receive the station position and time in UBX mode. Returns None without a valid time.
+def format_gprmc(fix):
+    if fix["unix_time"] is None:
+        return None
+    seconds = int(fix["unix_time"])
+    hundredths = int((fix["unix_time"] - seconds) * 100)
+    year, month, day, hour, minute, second = time.gmtime(seconds)[:6]
+    if fix["latitude"] is None:
+        position = ["V", "", "", "", ""]
+    else:
+        lat, lon = abs(fix["latitude"]), abs(fix["longitude"])
+        position = ["A",
+                    f"{int(lat):02d}{(lat - int(lat)) * 60:08.5f}", "N" if fix["latitude"] >= 0 else "S",
+                    f"{int(lon):03d}{(lon - int(lon)) * 60:08.5f}", "E" if fix["longitude"] >= 0 else "W"]
+    return build_sentence("GPRMC", f"{hour:02d}{minute:02d}{second:02d}.{hundredths:02d}", *position,
+                          f"{fix['ground_speed'] * 1.943844:.3f}", f"{fix['heading']:.2f}",
+                          f"{day:02d}{month:02d}{year % 100:02d}", "", "", "A" if fix["latitude"] is not None else "N")
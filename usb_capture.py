@@ -0,0 +1,152 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import usb.core
+import usb.util
+
+from shm_ring import SharedRingBuffer
+from ubx import nmea_mode_commands, ubx_mode_commands
+
+# Sources of the chunks written into the ring buffer.
+SOURCE_LD = 1
+SOURCE_GPS = 2
+
+# USB device settings, the same as in main.py.
+LD_VENDOR_ID, LD_PRODUCT_ID = 0x0403, 0xF241
+LD_INTERFACE, LD_ENDPOINT_OUT, LD_ENDPOINT_IN = 0, 0x02, 0x81
+GPS_VENDOR_ID, GPS_PRODUCT_ID = 0x1546, 0x01a7
+GPS_INTERFACE, GPS_ENDPOINT_OUT, GPS_ENDPOINT_IN = 1, 0x01, 0x82
+
+
+# Function to continuously send a keep-alive signal to the device.
+def send_keep_alive(dev, endpoint_address):
+    while True:
+        try:
+            dev.write(endpoint_address, b"\x4B\x41\x0A")
+        except usb.core.USBError as e:
+            print(f"Error sending keep alive command: {e}")
+        time.sleep(1)
+
+
+# Initialize the USB device configuration, claim the interface and detach the kernel driver
+def initialize_usb_device(device, interface):
+    if device.is_kernel_driver_active(interface):
+        try:
+            device.detach_kernel_driver(interface)
+        except usb.core.USBError as e:
+            print(f"Could not detach kernel driver for interface {interface}: {e}")
+            sys.exit(1)
+    try:
+        device.set_configuration()
+        usb.util.claim_interface(device, interface)
+        print(f"Interface {interface} claimed by capture process")
+    except usb.core.USBError as e:
+        print(f"Error setting up device on interface {interface}: {e}")
+        sys.exit(1)
+
+
+# Function to switch the u-blox GPS to UBX NAV-PVT output at `rate` solutions per second.
+def configure_ubx_output(device, endpoint_out, rate):
+    try:
+        for command in ubx_mode_commands(rate):
+            device.write(endpoint_out, command)
+        print(f"GPS configured for UBX NAV-PVT output at {rate:g} Hz")
+    except usb.core.USBError as e:
+        print(f"Could not configure GPS for UBX output: {e}")
+        sys.exit(1)
+
+
+# Function to put the u-blox GPS back to NMEA output. Failures are only logged, as this also runs on shutdown.
+def configure_nmea_output(device, endpoint_out):
+    try:
+        for command in nmea_mode_commands():
+            device.write(endpoint_out, command)
+    except usb.core.USBError as e:
+        print(f"Could not configure GPS for NMEA output: {e}")
+
+
+# Function to read one device forever and write every chunk, stamped with its capture time, into the ring.
+def capture_device(dev, endpoint_in, size, source, ring, ring_lock):
+    while True:
+        try:
+            data = dev.read(endpoint_in, size, timeout=5000)
+        except usb.core.USBTimeoutError:
+            continue  # Timeouts are expected when the device is quiet.
+        except usb.core.USBError as e:
+            print(f"USB Error in capture process: {e}")
+            continue
+        captured_at = time.time()
+        with ring_lock:
+            ring.write(source, captured_at, data)
+
+
+# Entry point of the capture process: owns both USB devices and only reads them, so the
+# processing in the main process can never make it miss a read.
+def capture_main():
+    parser = argparse.ArgumentParser(description="LD-350/GPS USB capture process.")
+    parser.add_argument("--ring", required=True, help="Name of the shared memory ring buffer")
+    parser.add_argument("--gps-ubx-rate", type=float, default=0.0,
+                        help="Switch the GPS to UBX output at this many solutions per second (0 keeps NMEA)")
+    args = parser.parse_args()
+
+    ring = SharedRingBuffer(args.ring)
+    ld_dev = usb.core.find(idVendor=LD_VENDOR_ID, idProduct=LD_PRODUCT_ID)
+    gps_dev = usb.core.find(idVendor=GPS_VENDOR_ID, idProduct=GPS_PRODUCT_ID)
+    if ld_dev is None or gps_dev is None:
+        print("LD-350 device or GPS USB reader not found")
+        sys.exit(1)
+    initialize_usb_device(ld_dev, LD_INTERFACE)
+    initialize_usb_device(gps_dev, GPS_INTERFACE)
+    if args.gps_ubx_rate > 0:
+        configure_ubx_output(gps_dev, GPS_ENDPOINT_OUT, args.gps_ubx_rate)
+    else:
+        configure_nmea_output(gps_dev, GPS_ENDPOINT_OUT)
+
+    threading.Thread(target=send_keep_alive, args=(gps_dev, GPS_ENDPOINT_OUT), daemon=True).start()
+    threading.Thread(target=send_keep_alive, args=(ld_dev, LD_ENDPOINT_OUT), daemon=True).start()
+
+    ring_lock = threading.Lock()
+    threading.Thread(target=capture_device, args=(gps_dev, GPS_ENDPOINT_IN, 512, SOURCE_GPS, ring, ring_lock),
+                     daemon=True).start()
+    try:
+        capture_device(ld_dev, LD_ENDPOINT_IN, 64, SOURCE_LD, ring, ring_lock)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.gps_ubx_rate > 0:
+            configure_nmea_output(gps_dev, GPS_ENDPOINT_OUT)
+        for dev, interface in ((ld_dev, LD_INTERFACE), (gps_dev, GPS_INTERFACE)):
+            usb.util.release_interface(dev, interface)
+            try:
+                dev.attach_kernel_driver(interface)
+            except usb.core.USBError as e:
+                print("Error reattaching kernel drivers:", e)
+        ring.close()
+
+
+# Function to create the ring buffer and start the USB capture process that fills it.
+def start_capture_process(capacity=1 << 20, gps_ubx_rate=0.0):
+    ring = SharedRingBuffer(f"ld350_{os.getpid()}", capacity, create=True)
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--ring", ring.name,
+                                "--gps-ubx-rate", str(gps_ubx_rate)])
+    print(f"Started USB capture process {process.pid} with ring buffer {ring.name}")
+    return ring, process
+
+
+# Function to stop the capture process (SIGINT lets it release the USB interfaces) and remove the ring.
+def stop_capture_process(ring, process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    ring.close()
+
+
+if __name__ == "__main__":
+    capture_main()